@@ -1,12 +1,21 @@
-from typing import Dict, Any, Optional, List
-from pydantic import BaseModel, Field, HttpUrl
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Literal, Deque, Iterator
+from pydantic import BaseModel, Field, HttpUrl, PrivateAttr
 import os
 import httpx
 import argparse
 import json
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
 
 from pydantic_core import Url
+import dedup
 import generate_json
+from cassette import CASSETTE_MODES, Cassette, request_key, text_response
+from metrics import CallMetrics, MetricsLog, percentile
+from key_pool import KeyPool, load_keys
+from retry_policy import CircuitBreaker, GeminiAPIError, RetryBudget, backoff_delay
 
 class GetAccessToGemini(BaseModel):
     """LLM based agent to send requests to Google Gemini."""
@@ -15,6 +24,21 @@ class GetAccessToGemini(BaseModel):
     api_base: HttpUrl = Field(HttpUrl(url), description="Google Gemini API base")
     timeout: float = Field(120.0, gt=0, description="Timeout (seconds)")
     token: str = Field(..., description="Google API Key")
+    cassette_path: Optional[str] = Field(None, description="Cassette file for record/replay")
+    cassette_mode: Literal["off", "record", "replay"] = Field("off", description="Cassette mode")
+    metrics_path: Optional[str] = Field(None, description="JSONL file receiving per-call metrics")
+    hedge: bool = Field(False, description="Send a duplicate request when the first one is slower than usual")
+    hedge_model: Optional[str] = Field(None, description="Model for the duplicate request (default: same model)")
+    hedge_quantile: float = Field(0.9, gt=0, lt=1, description="Observed latency quantile that triggers a hedge")
+    hedge_min_samples: int = Field(10, ge=1, description="Latency samples needed before hedging starts")
+    api_keys: List[str] = Field(default_factory=list, description="Pool of API keys to spread requests over")
+    key_rpm: int = Field(60, gt=0, description="Requests per minute allowed per pooled key")
+    max_attempts: int = Field(5, ge=1, description="Attempts per call for retryable failures")
+    backoff_base: float = Field(2.0, gt=0, description="Base delay of the exponential backoff (seconds)")
+    backoff_max: float = Field(60.0, gt=0, description="Upper bound of a single backoff delay (seconds)")
+    retry_budget_ratio: float = Field(0.2, ge=0, description="Retries allowed per request across the whole run")
+    breaker_threshold: int = Field(5, ge=1, description="Consecutive upstream failures that open the breaker")
+    breaker_reset: float = Field(30.0, gt=0, description="Seconds the breaker stays open before probing")
     
     AVAILABLE_MODELS: List[str] = [
         "gemini-2.5-flash-light",
@@ -22,12 +46,27 @@ class GetAccessToGemini(BaseModel):
         "gemini-2.5-flash",
     ]
 
+    _cassette: Optional[Cassette] = PrivateAttr(default=None)
+    _metrics: Optional[MetricsLog] = PrivateAttr(default=None)
+    _latencies: Deque[float] = PrivateAttr(default_factory=lambda: deque(maxlen=200))
+    _key_pool: Optional[KeyPool] = PrivateAttr(default=None)
+    _retry_budget: Optional[RetryBudget] = PrivateAttr(default=None)
+    _breaker: Optional[CircuitBreaker] = PrivateAttr(default=None)
+
     def setup(
         self,
         model: Optional[str] = None, 
         api_base: Optional[HttpUrl] = None,
         timeout: Optional[float] = None,
         token: Optional[str] = None,
+        cassette_path: Optional[str] = None,
+        cassette_mode: Optional[str] = None,
+        metrics_path: Optional[str] = None,
+        hedge: Optional[bool] = None,
+        hedge_model: Optional[str] = None,
+        api_keys: Optional[List[str]] = None,
+        key_rpm: Optional[int] = None,
+        max_attempts: Optional[int] = None,
     ) -> None:
         """Validated updates (optional)."""
         updates: Dict[str, Any] = {}
@@ -39,54 +78,395 @@ class GetAccessToGemini(BaseModel):
             updates["timeout"] = timeout
         if token is not None: 
             updates["token"] = token
+        if cassette_path is not None:
+            updates["cassette_path"] = cassette_path
+        if cassette_mode is not None:
+            updates["cassette_mode"] = cassette_mode
+        if metrics_path is not None:
+            updates["metrics_path"] = metrics_path
+        if hedge is not None:
+            updates["hedge"] = hedge
+        if hedge_model is not None:
+            updates["hedge_model"] = hedge_model
+        if api_keys is not None:
+            updates["api_keys"] = api_keys
+        if key_rpm is not None:
+            updates["key_rpm"] = key_rpm
+        if max_attempts is not None:
+            updates["max_attempts"] = max_attempts
         if updates:
             new_self = self.model_copy(update=updates)
-            self.model, self.api_base, self.timeout, self.token = (
-                new_self.model, new_self.api_base, new_self.timeout, new_self.token
-            )
+            for name in updates:
+                setattr(self, name, getattr(new_self, name))
+            self._open_resources()
+
+    def model_post_init(self, __context: Any) -> None:
+        self._retry_budget = RetryBudget(ratio=self.retry_budget_ratio)
+        self._breaker = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+        self._open_resources()
+
+    def _open_resources(self) -> None:
+        """
+        (Re)creates the cassette, metrics log and key pool from the current settings. Each
+        is kept as long as its own settings are unchanged, so repeated setup() calls neither
+        reload a replay cassette (resetting its cursors) nor reset pool quotas.
+        """
+        if self.cassette_mode == "off":
+            self._cassette = None
+        elif not self.cassette_path:
+            raise ValueError(f"Cassette mode '{self.cassette_mode}' requires a cassette path")
+        elif (
+            self._cassette is None
+            or self._cassette.path != self.cassette_path
+            or self._cassette.mode != self.cassette_mode
+        ):
+            self._cassette = Cassette(self.cassette_path, self.cassette_mode)
+        if self._metrics is None or self._metrics.path != self.metrics_path:
+            self._metrics = MetricsLog(self.metrics_path)
+        if not self.api_keys:
+            self._key_pool = None
+        elif (
+            self._key_pool is None
+            or self._key_pool.keys != self.api_keys
+            or self._key_pool.requests_per_minute != self.key_rpm
+        ):
+            self._key_pool = KeyPool(self.api_keys, self.key_rpm)
+
+    @property
+    def cassette(self) -> Optional[Cassette]:
+        """Cassette used for record/replay; None when disabled."""
+        return self._cassette
 
-    def communicate(self, prompt: str) -> str:
-        """Send a prompt to Google Gemini and return the text reply."""
+    @property
+    def metrics(self) -> MetricsLog:
+        """Per-call token and latency records for this agent."""
+        return self._metrics
+
+    @property
+    def key_pool(self) -> Optional[KeyPool]:
+        """Pool the API key of each request is drawn from; None when using the single token."""
+        return self._key_pool
+
+    @property
+    def has_credentials(self) -> bool:
+        """Whether requests can be authenticated, by the single token or by a key pool."""
+        return bool(self.token) or self._key_pool is not None
+
+    @staticmethod
+    def build_payload(prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Request body for a single-turn generateContent call."""
+        payload: Dict[str, Any] = {
+            "contents": [{
+                "parts": [{"text": prompt}]
+            }]
+        }
+        if generation_config:
+            payload["generationConfig"] = generation_config
+        return payload
+
+    @staticmethod
+    def extract_text(data: Dict[str, Any]) -> str:
+        """Pull the reply text out of a generateContent response."""
+        try:
+            candidate = data.get("candidates", [{}])[0]
+            content = candidate.get("content", {})
+            parts = content.get("parts", [{}])
+            msg = parts[0].get("text")
+        except (IndexError, AttributeError):
+            msg = None
+
+        if not msg:
+            raise ValueError(f"Invalid Gemini response: {data}")
+        return str(msg)
+
+    @staticmethod
+    def retry_after(response: httpx.Response) -> Optional[float]:
+        """Seconds requested by a Retry-After header, if the server sent one."""
+        try:
+            return float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            return None
+
+    @contextmanager
+    def _request(
+        self,
+        endpoint: str,
+        payload: Dict[str, Any],
+        model: Optional[str] = None,
+        client: Optional[httpx.Client] = None,
+    ) -> Iterator[httpx.Response]:
+        """
+        Opens a streamed POST to `models/<model>:<endpoint>` and yields the response once
+        its headers arrived. Failures are raised as GeminiAPIError (or ValueError).
+        """
         base = str(self.api_base).rstrip('/')
-        url = f"{base}/models/{self.model}:generateContent"
+        url = f"{base}/models/{model or self.model}:{endpoint}"
         
+        pool = self._key_pool
+        key = pool.acquire() if pool is not None else self.token
         headers = {
             "Content-Type": "application/json",
-            "x-goog-api-key": self.token
-        }
-        
-        payload = {
-            "contents": [{
-                "parts": [{"text": prompt}]
-            }]
+            "x-goog-api-key": key
         }
         
         try:
-            resp = httpx.post(url, headers=headers, json=payload, timeout=self.timeout)
-            resp.raise_for_status()
-            data = resp.json()
-            
-            try:
-                candidate = data.get("candidates", [{}])[0]
-                content = candidate.get("content", {})
-                parts = content.get("parts", [{}])
-                msg = parts[0].get("text")
-            except (IndexError, AttributeError):
-                msg = None
-
-            if not msg:
-                raise ValueError(f"Invalid Gemini response: {data}")
-            return str(msg)
+            sender = client.stream if client is not None else httpx.stream
+            with sender("POST", url, headers=headers, json=payload, timeout=self.timeout) as resp:
+                if resp.is_error:
+                    resp.read()
+                    resp.raise_for_status()
+                yield resp
             
         except httpx.HTTPStatusError as e:
-            raise ValueError(
-                f"HTTP {e.response.status_code} from {e.request.method} {e.request.url}: {e.response.text}"
+            retry_after = self.retry_after(e.response)
+            if pool is not None:
+                pool.report(key, e.response.status_code, retry_after)
+            raise GeminiAPIError(
+                f"HTTP {e.response.status_code} from {e.request.method} {e.request.url}: {e.response.text}",
+                status_code=e.response.status_code,
+                retry_after=retry_after,
             ) from e
+        except httpx.TransportError as e:
+            if pool is not None:
+                pool.report(key, None)
+            raise GeminiAPIError(f"Network error contacting Google Gemini: {e}") from e
         except httpx.HTTPError as e:
-            raise ValueError(f"Network error contacting Google Gemini: {e}") from e
+            raise ValueError(f"Invalid request to Google Gemini: {e}") from e
 
-    def predict(self, prompt: str) -> str:
-        return self.communicate(prompt)
+    def _post(
+        self,
+        payload: Dict[str, Any],
+        call: CallMetrics,
+        model: Optional[str] = None,
+        client: Optional[httpx.Client] = None,
+    ) -> Dict[str, Any]:
+        """
+        POST a generateContent request and return the decoded JSON body. The duration of
+        each successful attempt feeds hedge_delay(); failed attempts, retries and backoff
+        sleeps do not, so one throttled call cannot push the hedge delay out.
+        """
+        start = time.perf_counter()
+        with self._request("generateContent", payload, model, client) as resp:
+            call.ttfb = time.perf_counter() - start
+            resp.read()
+        data = resp.json()
+        self._latencies.append(time.perf_counter() - start)
+        return data
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Seconds after which a duplicate request is sent, the hedge_quantile of recent
+        successful attempt latencies; None while hedging is off or warming up.
+        """
+        if not self.hedge:
+            return None
+        samples = list(self._latencies)
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return percentile(samples, self.hedge_quantile)
+
+    def _hedged_post(self, payload: Dict[str, Any], call: CallMetrics) -> Dict[str, Any]:
+        """
+        Like _post, but if no answer arrives within hedge_delay() a duplicate request
+        (optionally to hedge_model) is sent; the first successful reply wins and the
+        other request is cancelled by closing its connection.
+        """
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._post(payload, call)
+
+        pool = ThreadPoolExecutor(max_workers=2)
+        attempts: Dict[Future, Any] = {}
+
+        def launch(model: str) -> Future:
+            client = httpx.Client()
+            scratch = CallMetrics(model=model)
+            future = pool.submit(self._post, payload, scratch, model, client)
+            attempts[future] = (client, scratch)
+            return future
+
+        try:
+            primary = launch(self.model)
+            done, _ = wait([primary], timeout=delay)
+            if not done:
+                call.hedged = True
+                launch(self.hedge_model or self.model)
+
+            pending = set(attempts)
+            error: Optional[ValueError] = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        data = future.result()
+                    except ValueError as e:
+                        error = e
+                        continue
+                    call.ttfb = attempts[future][1].ttfb
+                    call.model = attempts[future][1].model
+                    return data
+            assert error is not None
+            raise error
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            for client, _ in attempts.values():
+                client.close()
+
+    def _send_with_retries(self, payload: Dict[str, Any], call: CallMetrics) -> Dict[str, Any]:
+        """
+        Sends through the circuit breaker, retrying retryable failures with jittered
+        exponential backoff while attempts and the shared retry budget last.
+        """
+        self._retry_budget.record_request()
+        attempt = 0
+        while True:
+            self._breaker.before_request()
+            try:
+                data = self._hedged_post(payload, call)
+            except GeminiAPIError as e:
+                if not e.retryable:
+                    # The upstream answered; the request itself is at fault
+                    self._breaker.record_success()
+                    raise
+                self._breaker.record_failure()
+                if attempt + 1 >= self.max_attempts or not self._retry_budget.try_spend():
+                    raise
+
+                if e.status_code == 429 and self._key_pool is not None and len(self._key_pool.keys) > 1:
+                    delay = 0.0  # the pool rests the throttled key and picks another
+                else:
+                    delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, e.retry_after)
+                attempt += 1
+                call.retries = attempt
+                reason = f"HTTP {e.status_code}" if e.status_code else "Network error"
+                print(f"    [WARN] {reason} from {self.model}. Retrying in {delay:.1f}s ({attempt + 1}/{self.max_attempts})...")
+                time.sleep(delay)
+                continue
+            except Exception:
+                # Unreadable replies and transport errors outside GeminiAPIError still count as failures;
+                # a half-open probe must always be settled, or the breaker would stay open for good
+                self._breaker.record_failure()
+                raise
+
+            self._breaker.record_success()
+            return data
+
+    def communicate(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Send a prompt to Google Gemini and return the text reply.
+        `generation_config` is passed through as-is, e.g. for structured JSON output.
+        """
+        payload = self.build_payload(prompt, generation_config)
+        cassette = self.cassette
+        call = CallMetrics(model=self.model, cache=cassette.mode if cassette is not None else "off")
+        start = time.perf_counter()
+
+        try:
+            if cassette is not None and cassette.mode == "replay":
+                data = cassette.replay(request_key(self.model, payload))
+            else:
+                data = self._send_with_retries(payload, call)
+                if cassette is not None:
+                    cassette.record(request_key(self.model, payload), self.model, data)
+
+            call.record_usage(data)
+            return self.extract_text(data)
+
+        except ValueError as e:
+            call.status, call.error = "error", str(e)[:200]
+            raise
+        finally:
+            call.latency = time.perf_counter() - start
+            self.metrics.record(call)
+
+    def communicate_stream(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Send a prompt via streamGenerateContent and yield the reply text as it arrives.
+        The call is metered and recorded/replayed like communicate(), but a stream
+        that fails midway is not retried.
+        """
+        payload = self.build_payload(prompt, generation_config)
+        cassette = self.cassette
+        call = CallMetrics(model=self.model, cache=cassette.mode if cassette is not None else "off")
+        start = time.perf_counter()
+        parts: List[str] = []
+        usage: Dict[str, Any] = {}
+
+        try:
+            if cassette is not None and cassette.mode == "replay":
+                data = cassette.replay(request_key(self.model, payload))
+                call.record_usage(data)
+                yield self.extract_text(data)
+                return
+
+            self._breaker.before_request()
+            try:
+                with self._request("streamGenerateContent?alt=sse", payload) as resp:
+                    for line in resp.iter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        if call.ttfb is None:
+                            call.ttfb = time.perf_counter() - start
+                        data = json.loads(line[len("data:"):])
+                        usage = data.get("usageMetadata") or usage
+                        try:
+                            text = data["candidates"][0]["content"]["parts"][0].get("text", "")
+                        except (KeyError, IndexError, TypeError):
+                            text = ""
+                        if text:
+                            parts.append(text)
+                            yield text
+            except GeminiAPIError as e:
+                if e.retryable:
+                    self._breaker.record_failure()
+                else:
+                    self._breaker.record_success()
+                raise
+            self._breaker.record_success()
+
+            if not parts:
+                raise ValueError("Invalid Gemini response: stream contained no text")
+            data = {**text_response("".join(parts)), "usageMetadata": usage}
+            call.record_usage(data)
+            if cassette is not None:
+                cassette.record(request_key(self.model, payload), self.model, data)
+
+        except ValueError as e:
+            call.status, call.error = "error", str(e)[:200]
+            raise
+        finally:
+            call.latency = time.perf_counter() - start
+            self.metrics.record(call)
+
+    def predict(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+        return self.communicate(prompt, generation_config)
+
+    def for_model(self, model: str) -> "GetAccessToGemini":
+        """Copy of this agent targeting another model, sharing its cassette and metrics."""
+        return self.model_copy(update={"model": model})
+
+    def fan_out(
+        self,
+        prompts: Dict[str, str],
+        generation_config: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, str]:
+        """
+        Sends each model its prompt concurrently and returns the replies keyed by model.
+        Models whose request fails are reported and left out of the result.
+        """
+        replies: Dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=len(prompts) or 1) as pool:
+            futures = {
+                pool.submit(self.for_model(model).predict, prompt, generation_config): model
+                for model, prompt in prompts.items()
+            }
+            for future in as_completed(futures):
+                model = futures[future]
+                try:
+                    replies[model] = future.result()
+                except ValueError as e:
+                    print(f"[WARNING] {model} failed: {e}")
+        return {model: replies[model] for model in prompts if model in replies}
 
     def print_models(self):
         """Display models the user can choose from in the terminal."""
@@ -94,6 +474,76 @@ class GetAccessToGemini(BaseModel):
         for i, model in enumerate(self.AVAILABLE_MODELS, 1):
             print(f"{i}. {model}")
 
+    def add_connection_arguments(self, parser: argparse.ArgumentParser) -> None:
+        """Flags controlling how requests are sent, shared by every script that uses the agent."""
+        parser.add_argument(
+            "--api-base",
+            default=os.environ.get("GEMINI_API_BASE"),
+            help="Override the Gemini API base, e.g. a local mock_gemini.py server (env: GEMINI_API_BASE)"
+        )
+        parser.add_argument(
+            "--cassette",
+            default=os.environ.get("GEMINI_CASSETTE"),
+            help="Cassette file for recording or replaying requests (env: GEMINI_CASSETTE)"
+        )
+        parser.add_argument(
+            "--cassette-mode",
+            choices=CASSETTE_MODES,
+            default=os.environ.get("GEMINI_CASSETTE_MODE", "off"),
+            help="Record every request/response, replay them with zero network, or neither (env: GEMINI_CASSETTE_MODE)"
+        )
+        parser.add_argument(
+            "--metrics-log",
+            default=os.environ.get("GEMINI_METRICS_LOG"),
+            help="Append per-call token and latency metrics to this JSONL file (env: GEMINI_METRICS_LOG)"
+        )
+        parser.add_argument(
+            "--hedge",
+            action="store_true",
+            default=os.environ.get("GEMINI_HEDGE") == "1",
+            help="Send a duplicate request when a call is slower than the observed p90 latency (env: GEMINI_HEDGE=1)"
+        )
+        parser.add_argument(
+            "--hedge-model",
+            choices=self.AVAILABLE_MODELS,
+            default=os.environ.get("GEMINI_HEDGE_MODEL"),
+            help="Send hedged duplicates to this model instead (env: GEMINI_HEDGE_MODEL)"
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=int(os.environ.get("GEMINI_MAX_ATTEMPTS", "5")),
+            help="Attempts per call for 408/429/5xx and network failures (env: GEMINI_MAX_ATTEMPTS, default: 5)"
+        )
+        parser.add_argument(
+            "--api-keys-file",
+            default=os.environ.get("GEMINI_API_KEY_FILE"),
+            help="File with one API key per line to load-balance over; GEMINI_API_KEYS works too (env: GEMINI_API_KEY_FILE)"
+        )
+        parser.add_argument(
+            "--key-rpm",
+            type=int,
+            default=int(os.environ.get("GEMINI_KEY_RPM", "60")),
+            help="Requests per minute allowed per pooled key (env: GEMINI_KEY_RPM, default: 60)"
+        )
+
+    def apply_args(self, args: argparse.Namespace) -> None:
+        """Applies the flags added by cli_parser/add_connection_arguments."""
+        if getattr(args, "model", None):
+            self.setup(model=args.model)
+        if args.api_base:
+            self.setup(api_base=HttpUrl(args.api_base))
+        if args.cassette_mode != "off":
+            self.setup(cassette_path=args.cassette, cassette_mode=args.cassette_mode)
+        if args.metrics_log:
+            self.setup(metrics_path=args.metrics_log)
+        self.setup(max_attempts=args.max_attempts)
+        if args.hedge:
+            self.setup(hedge=True, hedge_model=args.hedge_model)
+        keys = load_keys(args.api_keys_file)
+        if keys:
+            self.setup(api_keys=keys, key_rpm=args.key_rpm)
+
     def cli_parser(self):
         """Creating a CLI to select different LLM models."""
         parser = argparse.ArgumentParser(description="Select the LLM model to use with GitHub Models")
@@ -108,6 +558,34 @@ class GetAccessToGemini(BaseModel):
             action="store_true",
             help="List all available models and exit"
         )
+        self.add_connection_arguments(parser)
+        parser.add_argument(
+            "--models",
+            nargs="+",
+            choices=self.AVAILABLE_MODELS,
+            help="Fan the generation prompt out to several models concurrently and merge the results"
+        )
+        parser.add_argument(
+            "--vary-prompts",
+            action="store_true",
+            help="With --models, give each model a different focus area instead of the same prompt"
+        )
+        parser.add_argument(
+            "--free-text",
+            action="store_true",
+            help="Request free-text generation instead of structured JSON output"
+        )
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            help="Stream a free-text reply and parse examples as they arrive (single model only)"
+        )
+        parser.add_argument(
+            "--dedup-threshold",
+            type=float,
+            default=dedup.DEFAULT_THRESHOLD,
+            help=f"MinHash similarity above which an example counts as a near-duplicate of an earlier one (env: DEDUP_THRESHOLD, default: {dedup.DEFAULT_THRESHOLD})"
+        )
         return parser
 
 # Much better prompt targeting real type checker divergences
@@ -293,14 +771,18 @@ Make sure that all the generated examples are correct for syntax!
 Before giving me the output run the typecheckers on the examples and only give me the output when there is disagreements between them!
 """
 
+# Extra focus hints used by --vary-prompts so fanned-out models explore different areas
+PROMPT_VARIATIONS = [
+    "",
+    "\nFOCUS: prioritize Protocols, TypedDict, NewType and Final in your examples.\n",
+    "\nFOCUS: prioritize ParamSpec, TypeGuard, overloads and Self/generic bounds in your examples.\n",
+]
+
 if __name__ == "__main__":
-    token = os.environ.get("GEMINI_API_KEY")
-    if not token:
-        raise ValueError("Please set GEMINI_API_KEY environment variable")
-    
+    # Without GEMINI_API_KEY the token stays empty; a key pool from the flags can stand in for it
     agent = GetAccessToGemini(
         model="gemini-2.5-flash", 
-        token=token,
+        token=os.environ.get("GEMINI_API_KEY", ""),
         api_base=HttpUrl("https://generativelanguage.googleapis.com/v1beta"),
         timeout=320.0,
     )
@@ -313,27 +795,70 @@ if __name__ == "__main__":
         agent.print_models()
         exit(0)
     
-    if args.model:
-        agent.setup(model=args.model)
+    agent.apply_args(args)
+    if not agent.has_credentials:
+        raise ValueError("Please set GEMINI_API_KEY, or GEMINI_API_KEYS / --api-keys-file for a key pool")
     
-    print(f"Using model: {agent.model}")
+    models = args.models or [agent.model]
+    print(f"Using model{'s' if len(models) > 1 else ''}: {', '.join(models)}")
     print("Generating type checker divergence examples...")
     
-    response = agent.predict(EXPERT_PROMPT)
-    print("\n" + "="*60)
-    print("GENERATED CODE EXAMPLES:")
-    print("="*60)
-    print(response)
+    if args.stream:
+        if len(models) > 1:
+            raise ValueError("--stream supports a single model")
+        chunks: List[str] = []
+
+        def tee(stream: Iterator[str]) -> Iterator[str]:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+
+        # Examples are parsed while the reply is still arriving
+        examples = []
+        for example in generate_json.iter_examples(tee(agent.communicate_stream(EXPERT_PROMPT))):
+            print(f"  <- Received {example['id']}")
+            examples.append({**example, "model": agent.model})
+        raw_response, model_used = "".join(chunks), agent.model
 
-    print("\n[INFO] Processing and saving output...")
-    
-    examples = generate_json.parse_generated_content(response)
+    else:
+        suffix = "" if args.free_text else generate_json.STRUCTURED_PROMPT_SUFFIX
+        prompts = {
+            model: EXPERT_PROMPT + (PROMPT_VARIATIONS[i % len(PROMPT_VARIATIONS)] if args.vary_prompts else "") + suffix
+            for i, model in enumerate(models)
+        }
+        responses = agent.fan_out(
+            prompts,
+            generation_config=None if args.free_text else generate_json.STRUCTURED_GENERATION_CONFIG,
+        )
+        if not responses:
+            raise ValueError(f"No model returned a response ({', '.join(models)})")
+
+        for model, response in responses.items():
+            print("\n" + "="*60)
+            print(f"GENERATED CODE EXAMPLES ({model}):")
+            print("="*60)
+            print(response)
+
+        print("\n[INFO] Processing and saving output...")
+        
+        examples = generate_json.merge_examples(
+            {model: generate_json.parse_response(response) for model, response in responses.items()}
+        )
+        # Only the models that answered count; a failed first model must not lose the others' examples
+        raw_response = next(iter(responses.values())) if len(responses) == 1 else "\n\n".join(
+            f"===== {model} =====\n{response}" for model, response in responses.items()
+        )
+        model_used = ", ".join(responses)
     
     if examples:
-        generate_json.save_output(examples, response, agent.model)
+        generate_json.save_output(examples, raw_response, model_used, args.dedup_threshold)
     else:
         print("[WARNING] No code examples found to save.")
 
+    agent.metrics.print_summary()
+    if agent.key_pool is not None:
+        agent.key_pool.print_usage()
+
 """
 interactive model selection
 python pydantic_better_version.py --interactive
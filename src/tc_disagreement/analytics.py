@@ -0,0 +1,173 @@
+"""
+Columnar export of checker results and judge verdicts across all runs.
+
+Flattens every run's results.json into one row per (example, checker, version) with
+diagnostic counts, error codes, timing and the latest judge verdict from the corpus
+database, held as a column-oriented table (dict of equal-length lists). The table
+is written as Parquet when pyarrow is installed and as CSV otherwise. Group-by
+aggregations use NumPy when it is available and plain Python when it is not.
+
+Usage:
+    python analytics.py export corpus.parquet          # or corpus.csv
+    python analytics.py rates --by checker version     # divergence and judged accuracy
+"""
+import os
+import csv
+import glob
+import json
+import argparse
+from collections import Counter
+from typing import Dict, List, Any, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+import diagnostics
+import run_checkers
+from corpus_db import DB_PATH, CorpusStore
+
+BASE_GEN_DIR = "generated_examples"
+
+COLUMNS = [
+    "run_id", "example_id", "family", "checker", "version",
+    "flagged", "minority", "errors", "warnings", "notes", "codes", "seconds", "verdict", "correct",
+]
+
+Table = Dict[str, List[Any]]
+
+
+def feature_family(example_id: str) -> str:
+    """Typing feature an example exercises, taken from its id prefix ('protocol-added-default-arg' -> 'protocol')."""
+    return example_id.split("-", 1)[0]
+
+
+def latest_verdicts(db_path: str = DB_PATH) -> Dict[Tuple[str, str, str], str]:
+    """(run_id, example_id, checker) -> most recent verdict recorded in the corpus database."""
+    if not os.path.exists(db_path):
+        return {}
+    with CorpusStore(db_path) as store:
+        rows = store.query("SELECT run_id, example_id, checker, verdict FROM verdicts ORDER BY created_at")
+    return {(r["run_id"], r["example_id"], r["checker"]): r["verdict"] for r in rows}
+
+
+def build_table(base_dir: str = BASE_GEN_DIR, db_path: str = DB_PATH) -> Table:
+    table: Table = {column: [] for column in COLUMNS}
+    verdicts = latest_verdicts(db_path)
+
+    for results_path in sorted(glob.glob(os.path.join(base_dir, "*", "results.json"))):
+        with open(results_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        run_id = os.path.basename(os.path.dirname(results_path))
+        versions = data.get("checker_versions", {})
+
+        for entry in data.get("results", []):
+            example_id = os.path.splitext(entry["filename"])[0]
+            flags = {tool: run_checkers.reports_error(tool, out) for tool, out in entry["outputs"].items()}
+            # Majority outcome among the checkers that ran; ties have no majority
+            votes = Counter(flag for flag in flags.values() if flag is not None).most_common()
+            majority = votes[0][0] if votes and (len(votes) == 1 or votes[0][1] > votes[1][1]) else None
+
+            for tool, output in entry["outputs"].items():
+                parsed = diagnostics.parse_diagnostics(output)
+                verdict = verdicts.get((run_id, example_id, tool))
+                row = {
+                    "run_id": run_id,
+                    "example_id": example_id,
+                    "family": feature_family(example_id),
+                    "checker": tool,
+                    "version": versions.get(tool, "unknown"),
+                    "flagged": flags[tool],
+                    "minority": None if flags[tool] is None or majority is None else flags[tool] != majority,
+                    "errors": diagnostics.count(parsed, "error"),
+                    "warnings": diagnostics.count(parsed, "warning"),
+                    "notes": diagnostics.count(parsed, "note"),
+                    "codes": ";".join(diagnostics.error_codes(parsed)),
+                    "seconds": entry.get("timings", {}).get(tool),
+                    "verdict": verdict,
+                    "correct": None if verdict in (None, "ERROR", "UNKNOWN") else verdict == "CORRECT",
+                }
+                for column in COLUMNS:
+                    table[column].append(row[column])
+    return table
+
+
+def write_table(table: Table, path: str) -> None:
+    """Writes .parquet (needs pyarrow) or .csv."""
+    if path.endswith(".parquet"):
+        if pa is None:
+            raise ValueError("Writing Parquet needs 'pyarrow'; use a .csv path instead")
+        pq.write_table(pa.table(table), path)
+        return
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(zip(*(table[column] for column in COLUMNS)))
+
+
+def group_rate(table: Table, by: List[str], column: str) -> Dict[Tuple[Any, ...], Tuple[float, int]]:
+    """Mean of a boolean `column` per group of `by` columns, ignoring None; group -> (rate, count)."""
+    keys = list(zip(*(table[b] for b in by)))
+    values = table[column]
+
+    if np is not None:
+        present = np.array([v is not None for v in values], dtype=bool)
+        hits = np.array([bool(v) for v in values], dtype=float)
+        uniques = sorted(set(keys), key=str)
+        position = {key: i for i, key in enumerate(uniques)}
+        group = np.fromiter((position[key] for key in keys), dtype=np.int64, count=len(keys))
+        counts = np.bincount(group[present], minlength=len(uniques))
+        sums = np.bincount(group[present], weights=hits[present], minlength=len(uniques))
+        return {
+            key: (float(sums[i] / counts[i]), int(counts[i]))
+            for i, key in enumerate(uniques) if counts[i]
+        }
+
+    totals: Dict[Tuple[Any, ...], List[int]] = {}
+    for key, value in zip(keys, values):
+        if value is None:
+            continue
+        bucket = totals.setdefault(key, [0, 0])
+        bucket[0] += bool(value)
+        bucket[1] += 1
+    return {key: (hit / n, n) for key, (hit, n) in sorted(totals.items(), key=lambda item: str(item[0]))}
+
+
+def print_rates(table: Table, by: List[str]) -> None:
+    divergence = group_rate(table, by, "minority")
+    accuracy = group_rate(table, by, "correct")
+    label = " / ".join(by)
+    print(f"{label:<40} | {'Divergence':<16} | {'Judged correct'}")
+    print("-" * 80)
+    for key in sorted(set(divergence) | set(accuracy), key=str):
+        div = divergence.get(key)
+        acc = accuracy.get(key)
+        div_text = f"{div[0] * 100:5.1f}% of {div[1]}" if div else "n/a"
+        acc_text = f"{acc[0] * 100:5.1f}% of {acc[1]}" if acc else "n/a"
+        print(f"{' / '.join(map(str, key)):<40} | {div_text:<16} | {acc_text}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and aggregate checker results as a columnar table")
+    parser.add_argument("--base-dir", default=BASE_GEN_DIR, help=f"Generation runs directory (default: {BASE_GEN_DIR})")
+    parser.add_argument("--db", default=DB_PATH, help=f"Corpus database with verdicts (default: {DB_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Write the table as .parquet (pyarrow) or .csv")
+    export.add_argument("output")
+    rates = sub.add_parser("rates", help="Divergence and judged accuracy per group")
+    rates.add_argument("--by", nargs="+", default=["checker"], choices=["checker", "version", "family", "run_id"])
+    args = parser.parse_args()
+
+    table = build_table(args.base_dir, args.db)
+    if args.command == "export":
+        write_table(table, args.output)
+        print(f"[INFO] Wrote {len(table['run_id'])} rows to {args.output}")
+    else:
+        print_rates(table, args.by)
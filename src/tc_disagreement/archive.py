@@ -0,0 +1,177 @@
+"""
+Compressed result archives with random access.
+
+An archive is a data file of independently compressed JSON records plus a small
+offset index next to it (`<archive>.idx`, JSON: codec and key -> [offset, length]).
+Reading one record seeks straight to it and decompresses only that record. Records
+are appended; writing an existing key again appends a new version and the index
+points at the latest one. Records are compressed with zstandard when it is
+installed and with zlib otherwise; the codec is stored in the index.
+
+One record per checked file, keyed "<run_id>/<example_id>":
+    {"run_id", "filename", "source", "outputs", "timings", "checker_versions", "verdicts"?}
+
+Usage:
+    python archive.py pack results.tca                 # archive every run with a results.json
+    python archive.py ls results.tca [--prefix RUN]
+    python archive.py get results.tca RUN/EXAMPLE_ID
+"""
+import os
+import json
+import glob
+import zlib
+import argparse
+import threading
+from typing import Dict, List, Any, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BASE_GEN_DIR = "generated_examples"
+DEFAULT_CODEC = "zstd" if zstandard is not None else "zlib"
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class ResultArchive:
+    """Append-only archive of JSON records with a key -> (offset, length) index; a context manager."""
+
+    def __init__(self, path: str, codec: Optional[str] = None):
+        self.path = path
+        self.index_path = path + ".idx"
+        self._lock = threading.Lock()
+        self._index: Dict[str, List[int]] = {}
+        self._dirty = False
+        self.codec = codec or DEFAULT_CODEC
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.codec = data["codec"]
+            self._index = data["records"]
+        if self.codec == "zstd" and zstandard is None:
+            raise ValueError(f"{path} is zstd-compressed; install 'zstandard' to read it")
+        if self.codec not in ("zstd", "zlib"):
+            raise ValueError(f"Unknown archive codec '{self.codec}'")
+
+    def __enter__(self) -> "ResultArchive":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def keys(self, prefix: str = "") -> List[str]:
+        return sorted(k for k in self._index if k.startswith(prefix))
+
+    def put(self, key: str, record: Dict[str, Any]) -> None:
+        """Appends `record` under `key`; call `flush()` (or leave the `with` block) to persist the index."""
+        blob = _compress(self.codec, json.dumps(record, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(blob)
+            self._index[key] = [offset, len(blob)]
+            self._dirty = True
+
+    def get(self, key: str) -> Dict[str, Any]:
+        """Reads a single record without touching the rest of the archive."""
+        if key not in self._index:
+            raise KeyError(f"{key} not in archive {self.path}")
+        offset, length = self._index[key]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(_decompress(self.codec, f.read(length)))
+
+    def records(self, prefix: str = "") -> Iterator[Dict[str, Any]]:
+        for key in self.keys(prefix):
+            yield self.get(key)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"codec": self.codec, "records": self._index}, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+
+def record_key(run_id: str, filename: str) -> str:
+    return f"{run_id}/{os.path.splitext(filename)[0]}"
+
+
+def archive_results(archive: ResultArchive, run_id: str, results: List[Dict[str, Any]], versions: Dict[str, str]) -> None:
+    """Stores results.json entries (with their source code) as archive records."""
+    for entry in results:
+        try:
+            with open(entry["filepath"], "r", encoding="utf-8") as f:
+                source = f.read()
+        except FileNotFoundError:
+            source = None
+        archive.put(record_key(run_id, entry["filename"]), {
+            "run_id": run_id,
+            "filename": entry["filename"],
+            "source": source,
+            "outputs": entry["outputs"],
+            "timings": entry.get("timings", {}),
+            "checker_versions": versions,
+        })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and read compressed result archives")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pack = sub.add_parser("pack", help="Archive the results.json of run folders")
+    pack.add_argument("archive", help="Archive file")
+    pack.add_argument("run_dirs", nargs="*", help=f"Run folders (default: every run in {BASE_GEN_DIR} with results)")
+    ls = sub.add_parser("ls", help="List record keys")
+    ls.add_argument("archive")
+    ls.add_argument("--prefix", default="", help="Only keys starting with this (e.g. a run id)")
+    get = sub.add_parser("get", help="Print one record")
+    get.add_argument("archive")
+    get.add_argument("key", help="<run_id>/<example_id>")
+    args = parser.parse_args()
+
+    if args.command != "pack" and not os.path.exists(args.archive):
+        print(f"[ERROR] Archive not found: {args.archive}")
+        raise SystemExit(1)
+
+    with ResultArchive(args.archive) as archive:
+        if args.command == "pack":
+            run_dirs = args.run_dirs or sorted(
+                os.path.dirname(p) for p in glob.glob(os.path.join(BASE_GEN_DIR, "*", "results.json"))
+            )
+            for run_dir in run_dirs:
+                with open(os.path.join(run_dir, "results.json"), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                results = data.get("results", [])
+                archive_results(archive, os.path.basename(os.path.normpath(run_dir)), results, data.get("checker_versions", {}))
+                print(f"  -> Archived {len(results)} results from {run_dir}")
+            print(f"[INFO] {args.archive}: {len(archive)} records, {os.path.getsize(args.archive)} bytes ({archive.codec})")
+        elif args.command == "ls":
+            for key in archive.keys(args.prefix):
+                print(key)
+        else:
+            print(json.dumps(archive.get(args.key), indent=4))
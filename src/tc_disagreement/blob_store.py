@@ -0,0 +1,166 @@
+"""
+Content-addressed storage for the text saved with each generation run.
+
+Snippets and raw responses are written once to `generated_examples/blobs/<aa>/<rest>`,
+named by the sha256 of their text and zlib-compressed, and examples.json refers to
+them by hash (`full_content_blob`, `raw_response_blob`). The same snippet saved by
+several runs is stored once. `code` is not stored, since it is the tail of full_content;
+`load_examples` resolves the references back to text, derives `code` again and also
+reads older examples.json files that hold the text inline or a `code_blob`.
+
+Usage:
+    python blob_store.py pack [RUN_DIR ...]     # move inline text of existing runs into blobs
+    python blob_store.py stats                  # corpus size on disk
+"""
+import os
+import json
+import glob
+import zlib
+import hashlib
+import argparse
+import tempfile
+from typing import Dict, List, Any
+
+BASE_GEN_DIR = "generated_examples"
+BLOB_DIR_NAME = "blobs"
+
+# examples.json fields stored as blobs, per example and per run
+EXAMPLE_BLOB_FIELDS = ("full_content",)
+RUN_BLOB_FIELDS = ("raw_response",)
+
+
+class BlobStore:
+    """hash -> zlib-compressed UTF-8 text, one file per blob."""
+
+    def __init__(self, root: str = os.path.join(BASE_GEN_DIR, BLOB_DIR_NAME)):
+        self.root = root
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def put(self, text: str) -> str:
+        """Stores `text` (if not already present) and returns its hash."""
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so concurrent writers never expose a partial blob
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(data, 9))
+            os.replace(tmp_path, path)
+        return digest
+
+    def get(self, digest: str) -> str:
+        path = self._path(digest)
+        if not os.path.exists(path):
+            raise ValueError(f"Missing blob {digest[:12]} in {self.root}")
+        with open(path, "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+
+def store_for(json_path: str) -> BlobStore:
+    """The blob store next to a run's examples.json (`<base>/<run>/examples.json` -> `<base>/blobs`)."""
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(json_path)))
+    return BlobStore(os.path.join(base_dir, BLOB_DIR_NAME))
+
+
+def pack(data: Dict[str, Any], store: BlobStore) -> Dict[str, Any]:
+    """Copy of examples.json content with the text fields replaced by blob references."""
+    packed = {k: v for k, v in data.items() if k not in RUN_BLOB_FIELDS and k != "examples"}
+    for field in RUN_BLOB_FIELDS:
+        if data.get(field) is not None:
+            packed[f"{field}_blob"] = store.put(data[field])
+    packed["examples"] = []
+    for ex in data.get("examples", []):
+        entry = {k: v for k, v in ex.items() if k not in EXAMPLE_BLOB_FIELDS}
+        if "full_content" in ex:
+            entry.pop("code", None)
+        for field in EXAMPLE_BLOB_FIELDS:
+            if field in ex:
+                entry[f"{field}_blob"] = store.put(ex[field])
+        packed["examples"].append(entry)
+    return packed
+
+
+def resolve(data: Dict[str, Any], store: BlobStore) -> Dict[str, Any]:
+    """Inverse of `pack`; content that is already inline is returned unchanged."""
+    # Imported here: generate_json imports this module
+    from generate_json import split_code
+
+    resolved = {k: v for k, v in data.items() if k != "examples"}
+    for field in RUN_BLOB_FIELDS:
+        digest = resolved.pop(f"{field}_blob", None)
+        if digest is not None:
+            resolved[field] = store.get(digest)
+    resolved["examples"] = []
+    for ex in data.get("examples", []):
+        entry = dict(ex)
+        for field in EXAMPLE_BLOB_FIELDS + ("code",):
+            digest = entry.pop(f"{field}_blob", None)
+            if digest is not None:
+                entry[field] = store.get(digest)
+        if "code" not in entry and "full_content" in entry:
+            entry["code"] = split_code(entry["id"], entry.get("metadata", ""), entry["full_content"])
+        resolved["examples"].append(entry)
+    return resolved
+
+
+def load_examples(json_path: str) -> Dict[str, Any]:
+    """Reads an examples.json with every blob reference resolved to its text."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return resolve(data, store_for(json_path))
+
+
+def disk_usage(base_dir: str = BASE_GEN_DIR) -> Dict[str, int]:
+    """Bytes used by run JSON files, saved source files and blobs."""
+    usage = {"json": 0, "source_files": 0, "blobs": 0}
+    for path in glob.glob(os.path.join(base_dir, "*", "*.json")):
+        usage["json"] += os.path.getsize(path)
+    for path in glob.glob(os.path.join(base_dir, "*", "source_files", "*.py")):
+        usage["source_files"] += os.path.getsize(path)
+    for path in glob.glob(os.path.join(base_dir, BLOB_DIR_NAME, "*", "*")):
+        usage["blobs"] += os.path.getsize(path)
+    return usage
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the content-addressed blob store of generation runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pack_cmd = sub.add_parser("pack", help="Move inline text of existing runs into blobs and normalize result paths")
+    pack_cmd.add_argument("run_dirs", nargs="*", help=f"Run folders (default: every run in {BASE_GEN_DIR})")
+    sub.add_parser("stats", help="Show the corpus size on disk")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        run_dirs: List[str] = args.run_dirs or sorted(
+            os.path.dirname(p) for p in glob.glob(os.path.join(BASE_GEN_DIR, "*", "examples.json"))
+        )
+        before = disk_usage()
+        for run_dir in run_dirs:
+            json_path = os.path.join(run_dir, "examples.json")
+            data = load_examples(json_path)
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(pack(data, store_for(json_path)), f, indent=4)
+            print(f"  -> Packed {json_path}")
+
+            results_path = os.path.join(run_dir, "results.json")
+            if os.path.exists(results_path):
+                from run_checkers import normalize_paths
+                with open(results_path, "r", encoding="utf-8") as f:
+                    results = json.load(f)
+                for entry in results.get("results", []):
+                    entry["outputs"] = {
+                        tool: normalize_paths(out, entry["filepath"]) for tool, out in entry["outputs"].items()
+                    }
+                with open(results_path, "w", encoding="utf-8") as f:
+                    json.dump(results, f, indent=4)
+        after = disk_usage()
+        print(f"[INFO] Packed {len(run_dirs)} runs: {sum(before.values())} -> {sum(after.values())} bytes")
+    else:
+        usage = disk_usage()
+        for kind, size in usage.items():
+            print(f"{kind:<13} | {size:>10} bytes")
+        print(f"{'total':<13} | {sum(usage.values()):>10} bytes")
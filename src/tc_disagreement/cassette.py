@@ -0,0 +1,132 @@
+"""
+Record/replay cassettes for Gemini requests.
+
+A cassette is a JSONL file with one line per request/response pair:
+    {"key": <sha256 of model + request payload>, "model": ..., "response": <Gemini JSON>}
+Prompts are not stored, only their digest, which keeps cassettes compact.
+Replaying serves the recorded responses for a key in order (cycling when exhausted),
+so the whole pipeline can be re-run with zero network.
+
+Usage:
+    python agent.py --cassette cassettes/run.jsonl --cassette-mode record
+    python agent.py --cassette cassettes/run.jsonl --cassette-mode replay
+    python cassette.py seed --output cassettes/generation.jsonl
+"""
+import os
+import json
+import glob
+import hashlib
+import argparse
+import threading
+from typing import Dict, Any, List
+
+from blob_store import load_examples
+
+CASSETTE_MODES = ["off", "record", "replay"]
+
+BASE_GEN_DIR = "generated_examples"
+
+
+def request_key(model: str, payload: Dict[str, Any]) -> str:
+    """Stable digest identifying a request, independent of API key and endpoint."""
+    blob = json.dumps({"model": model, "payload": payload}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def text_response(text: str) -> Dict[str, Any]:
+    """Wraps plain text into the minimal generateContent response shape."""
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]}
+
+
+class Cassette:
+    """Thread-safe request/response store backing GetAccessToGemini's record and replay modes."""
+
+    def __init__(self, path: str, mode: str):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Invalid cassette mode '{mode}', expected 'record' or 'replay'")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+
+        if mode == "replay":
+            if not os.path.exists(path):
+                raise ValueError(f"Cassette not found: {path}")
+            self._load()
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self._entries.setdefault(entry["key"], []).append(entry["response"])
+
+    def __len__(self) -> int:
+        return sum(len(responses) for responses in self._entries.values())
+
+    def replay(self, key: str) -> Dict[str, Any]:
+        """Returns the next recorded response for `key`."""
+        with self._lock:
+            responses = self._entries.get(key)
+            if not responses:
+                raise ValueError(f"Cassette miss: no recorded response for request {key[:12]} in {self.path}")
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            return responses[index % len(responses)]
+
+    def record(self, key: str, model: str, response: Dict[str, Any]) -> None:
+        """Appends a request/response pair to the cassette file."""
+        line = json.dumps({"key": key, "model": model, "response": response}, separators=(",", ":"))
+        with self._lock:
+            self._entries.setdefault(key, []).append(response)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def seed_from_examples(output: str, base_dir: str = BASE_GEN_DIR) -> int:
+    """
+    Builds a cassette from the raw responses saved in `<base_dir>/*/examples.json`,
+    keyed as if they answered the free-text EXPERT_PROMPT request, so
+    `agent.py --free-text --cassette-mode replay` reproduces past generation runs offline.
+    """
+    from agent import EXPERT_PROMPT, GetAccessToGemini
+
+    cassette = Cassette(output, "record")
+    count = 0
+    for json_path in sorted(glob.glob(os.path.join(base_dir, "*", "examples.json"))):
+        data = load_examples(json_path)
+        model = data.get("model_used", "gemini-2.5-flash")
+        if not data.get("raw_response") or ", " in model:
+            # Multi-model runs hold several concatenated responses and cannot be replayed as one
+            continue
+        key = request_key(model, GetAccessToGemini.build_payload(EXPERT_PROMPT))
+        cassette.record(key, model, text_response(data["raw_response"]))
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or seed Gemini request cassettes")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    seed = sub.add_parser("seed", help="Build a generation cassette from saved examples.json raw responses")
+    seed.add_argument("--output", required=True, help="Cassette file to append to")
+    seed.add_argument("--base-dir", default=BASE_GEN_DIR, help=f"Generation runs directory (default: {BASE_GEN_DIR})")
+
+    info = sub.add_parser("info", help="Summarize a cassette")
+    info.add_argument("path", help="Cassette file")
+
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        n = seed_from_examples(args.output, args.base_dir)
+        print(f"[INFO] Recorded {n} generation responses into {args.output}")
+    else:
+        cassette = Cassette(args.path, "replay")
+        print(f"[INFO] {args.path}: {len(cassette)} responses for {len(cassette._entries)} distinct requests")
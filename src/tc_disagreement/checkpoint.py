@@ -0,0 +1,93 @@
+"""
+Judge checkpoints for resumable evaluation.
+
+A checkpoint is a JSONL file with one line per judged (file, checker) pair,
+appended and fsynced as soon as the verdict arrives:
+    {"filename": ..., "tool": ..., "model": ..., "verdict": ..., "reason": ..., "agreement": ...}
+`eval.py --resume` loads it, skips every pair that already has a verdict from the
+same judge model and rebuilds the leaderboard from the checkpointed verdicts plus
+the new ones. ERROR verdicts are not reused, so resuming retries failed calls.
+A later line for the same pair replaces an earlier one. Verdicts settled locally
+(eval.py --prejudge) are stored under the local model name and come back marked `local`.
+"""
+import os
+import json
+import threading
+from typing import Dict, Any, Optional
+
+
+def _verdict(result: Dict[str, Any]) -> Dict[str, Any]:
+    """The persisted part of a verdict; `agreement` only for voted verdicts."""
+    verdict = {"verdict": result["verdict"], "reason": result["reason"]}
+    if result.get("agreement") is not None:
+        verdict["agreement"] = result["agreement"]
+    return verdict
+
+
+class JudgeCheckpoint:
+    """
+    Thread-safe append-only verdict log; starts empty unless `resume` is set.
+    Verdicts with `local` set are recorded under `local_model` instead of the judge model.
+    """
+
+    def __init__(self, path: str, model: str, resume: bool = False, local_model: Optional[str] = None):
+        self.path = path
+        self.model = model
+        self.local_model = local_model
+        self._lock = threading.Lock()
+        self._verdicts: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if resume and os.path.exists(path):
+            self._load()
+        else:
+            open(path, "w", encoding="utf-8").close()
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by the interruption; that pair is judged again
+                    continue
+                if entry.get("model") not in (self.model, self.local_model):
+                    continue
+                tools = self._verdicts.setdefault(entry["filename"], {})
+                if entry["verdict"] == "ERROR":
+                    tools.pop(entry["tool"], None)
+                else:
+                    tools[entry["tool"]] = self._restored(entry, entry["model"])
+
+    def _model_of(self, result: Dict[str, Any]) -> str:
+        return self.local_model if result.get("local") and self.local_model is not None else self.model
+
+    def _restored(self, result: Dict[str, Any], model: str) -> Dict[str, Any]:
+        """The verdict as verdicts_for() hands it back, marked `local` if it was settled locally."""
+        if model == self.local_model and model != self.model:
+            return {**_verdict(result), "local": True}
+        return _verdict(result)
+
+    def __len__(self) -> int:
+        return sum(len(tools) for tools in self._verdicts.values())
+
+    def verdicts_for(self, filename: str) -> Dict[str, Dict[str, Any]]:
+        """Checkpointed verdicts of one file, by checker."""
+        return dict(self._verdicts.get(filename, {}))
+
+    def record(self, filename: str, verdicts: Dict[str, Dict[str, Any]]) -> None:
+        """Appends the verdicts of one file and forces them to disk."""
+        lines = [
+            json.dumps({"filename": filename, "tool": tool, "model": self._model_of(result), **_verdict(result)}, ensure_ascii=False)
+            for tool, result in verdicts.items()
+        ]
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(line + "\n" for line in lines))
+                f.flush()
+                os.fsync(f.fileno())
+            for tool, result in verdicts.items():
+                if result["verdict"] != "ERROR":
+                    self._verdicts.setdefault(filename, {})[tool] = self._restored(result, self._model_of(result))
@@ -0,0 +1,208 @@
+"""
+Compact judge inputs: smaller prompts carrying the same findings.
+
+Checker outputs are rewritten one diagnostic per line as
+    35:43 error [invalid-argument-type] Argument to function `create_processor` is incorrect; Expected `type[Unknown]`
+File paths, summary lines and [STDERR] markers are dropped. Code frames (pyrefly and
+ty) are dropped too, except for the labels under their carets, which are appended to
+the message. Repeated diagnostics are listed once with a count. Lines that are not
+recognized as diagnostics are kept as they are, minus paths.
+
+Optionally the source is cut down to the lines around every line any checker
+reported, with the gaps marked; a file with no reported lines keeps its full source.
+
+Usage:
+    python compact.py                              # tokens saved on the latest run
+    python compact.py path/to/results.json --context-lines 3
+"""
+import os
+import re
+import json
+import glob
+import argparse
+from typing import Dict, List, Optional, Set, Tuple
+
+from diagnostics import MYPY_LINE, PYREFLY_HEAD, PYREFLY_SUMMARY, TY_HEAD, LOCATION, SEVERITIES
+from verdict_cache import CLEAN_OUTPUT, SUMMARY_LINES, PATH_PREFIX
+
+BASE_GEN_DIR = "generated_examples"
+
+# Code frame rows: "35 |     code", "   |", "   |     ^^^^^^^ label"
+FRAME_LINE = re.compile(r"^\s*(?P<number>\d+)?\s*\|(?P<rest>.*)$")
+FRAME_LABEL = re.compile(r"^[\s^~-]*[\^~-]\s+(?P<label>[^\s^~-].*)$")
+# ty sub-diagnostics ("info: Function defined here") and its fixed rule footer
+TY_SUB = re.compile(r"^(?P<severity>info|note|help|warning): (?P<message>.*)$")
+BOILERPLATE = re.compile(r"^(info|help): rule `[\w-]+` (is enabled by default|was selected .*)$")
+# Dotted module names of checked files, as zuban prints them in revealed types
+MODULE_PREFIX = re.compile(r"\b[\w.-]*\bsource_files\.")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token); eval.py sizes judge batches with it too."""
+    return len(text) // 4 + 1
+
+
+def _render(severity: str, code: Optional[str], line: Optional[int], column: Optional[int], message: str) -> str:
+    location = f"{line}:{column}" if column is not None else str(line) if line is not None else "-"
+    code_text = f" [{code}]" if code else ""
+    return f"{location} {severity}{code_text} {message}"
+
+
+def _parse(output: str) -> Tuple[List[Dict], Set[int]]:
+    """Diagnostics (with caret labels folded into the message) and every line number reported."""
+    entries: List[Dict] = []
+    lines: Set[int] = set()
+    for raw in MODULE_PREFIX.sub("", output).splitlines():
+        if not raw.strip() or SUMMARY_LINES.match(raw) or PYREFLY_SUMMARY.match(raw):
+            continue
+
+        match = MYPY_LINE.match(raw)
+        if match:
+            entries.append({
+                "severity": SEVERITIES[match["severity"]], "code": match["code"],
+                "line": int(match["line"]), "column": int(match["col"]) if match["col"] else None,
+                "message": match["message"].strip(),
+            })
+            lines.add(int(match["line"]))
+            continue
+
+        match = LOCATION.match(raw)
+        if match:
+            if entries and entries[-1]["line"] is None:
+                entries[-1]["line"] = int(match["line"])
+                entries[-1]["column"] = int(match["col"])
+            lines.add(int(match["line"]))
+            continue
+
+        match = FRAME_LINE.match(raw)
+        if match:
+            label = FRAME_LABEL.match(match["rest"]) if match["number"] is None else None
+            if label and entries:
+                entries[-1]["message"] += f"; {label['label'].strip()}"
+            continue
+
+        if BOILERPLATE.match(raw):
+            continue
+        match = TY_HEAD.match(raw) or PYREFLY_HEAD.match(raw)
+        if match:
+            entries.append({
+                "severity": SEVERITIES[match["severity"]], "code": match["code"],
+                "line": None, "column": None, "message": match["message"].strip(),
+            })
+            continue
+        match = TY_SUB.match(raw)
+        if match and entries:
+            entries.append({
+                "severity": SEVERITIES.get(match["severity"], "note"), "code": None,
+                "line": None, "column": None, "message": match["message"].strip(), "sub": True,
+            })
+            continue
+
+        entries.append({"text": PATH_PREFIX.sub("", raw).strip()})
+
+    # Sub-diagnostics without a location of their own belong to the diagnostic above them
+    merged: List[Dict] = []
+    for entry in entries:
+        if entry.get("sub") and entry["line"] is None and merged and "text" not in merged[-1]:
+            merged[-1]["message"] += f"; {entry['severity']}: {entry['message']}"
+        else:
+            merged.append(entry)
+    return merged, lines
+
+
+def compact_output(output: str) -> str:
+    """One line per distinct diagnostic, in order; repeats get a "(xN)" suffix."""
+    counts: Dict[str, int] = {}
+    for entry in _parse(output)[0]:
+        text = entry.get("text") or _render(entry["severity"], entry["code"], entry["line"], entry["column"], entry["message"])
+        counts[text] = counts.get(text, 0) + 1
+    rendered = [text if n == 1 else f"{text} (x{n})" for text, n in counts.items()]
+    return "\n".join(rendered) or CLEAN_OUTPUT
+
+
+def reported_lines(outputs: Dict[str, str]) -> Set[int]:
+    """Source line numbers mentioned by any of the checker outputs."""
+    lines: Set[int] = set()
+    for output in outputs.values():
+        lines |= _parse(output)[1]
+    return lines
+
+
+def source_context(source_code: str, lines: Set[int], radius: int) -> str:
+    """Source lines within `radius` of `lines`, numbered, with omitted ranges marked; all of it if `lines` is empty."""
+    source_lines = source_code.splitlines()
+    if not lines:
+        return source_code
+    keep = {n for line in lines for n in range(line - radius, line + radius + 1) if 1 <= n <= len(source_lines)}
+
+    kept: List[str] = []
+    skipped = 0
+    for number, text in enumerate(source_lines, start=1):
+        if number not in keep:
+            skipped += 1
+            continue
+        if skipped:
+            kept.append(f"# ... {skipped} lines omitted")
+            skipped = 0
+        kept.append(f"{number:>4}| {text}")
+    if skipped:
+        kept.append(f"# ... {skipped} lines omitted")
+    return "\n".join(kept)
+
+
+def compact_inputs(
+    source_code: str, outputs: Dict[str, str], compact: bool = True, context_lines: Optional[int] = None,
+) -> Tuple[str, Dict[str, str]]:
+    """The source and outputs of one file as they should appear in judge prompts."""
+    if context_lines is not None:
+        source_code = source_context(source_code, reported_lines(outputs), context_lines)
+    if compact:
+        outputs = {tool: compact_output(output) for tool, output in outputs.items()}
+    return source_code, outputs
+
+
+def savings(pairs: List[Tuple[Tuple[str, Dict[str, str]], Tuple[str, Dict[str, str]]]]) -> Tuple[int, int]:
+    """Estimated prompt tokens before and after, over (raw, compacted) (source, outputs) pairs."""
+    before = after = 0
+    for (raw_source, raw_outputs), (source, outputs) in pairs:
+        before += estimate_tokens(raw_source) + sum(estimate_tokens(o) for o in raw_outputs.values())
+        after += estimate_tokens(source) + sum(estimate_tokens(o) for o in outputs.values())
+    return before, after
+
+
+def print_savings(before: int, after: int) -> None:
+    saved = before - after
+    share = saved / before * 100 if before else 0.0
+    print(f"[INFO] Judge inputs compacted from ~{before} to ~{after} tokens ({saved} saved, {share:.1f}%).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the prompt tokens compaction saves on a run's judge inputs")
+    parser.add_argument("results", nargs="?", help="results.json (default: the latest run with results)")
+    parser.add_argument("--context-lines", type=int, default=None, help="Also cut sources to this many lines around reported lines")
+    parser.add_argument("--show", action="store_true", help="Print every compacted output")
+    args = parser.parse_args()
+
+    results_path = args.results or max(glob.glob(os.path.join(BASE_GEN_DIR, "*", "results.json")), default=None)
+    if not results_path:
+        print("[ERROR] No results.json found. Run 'run_checkers.py' first.")
+        raise SystemExit(1)
+    with open(results_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    pairs = []
+    for entry in data.get("results", []):
+        try:
+            with open(entry.get("filepath", entry["filename"]), "r", encoding="utf-8") as f:
+                source = f.read()
+        except FileNotFoundError:
+            print(f"[WARN] Source file not found: {entry.get('filepath')}")
+            continue
+        compacted = compact_inputs(source, entry["outputs"], context_lines=args.context_lines)
+        pairs.append(((source, entry["outputs"]), compacted))
+        if args.show:
+            for tool, output in compacted[1].items():
+                print(f"--- {entry['filename']} / {tool}\n{output}")
+
+    print(f"Source: {results_path} ({len(pairs)} files)")
+    print_savings(*savings(pairs))
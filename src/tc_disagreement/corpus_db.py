@@ -0,0 +1,395 @@
+"""
+Indexed SQLite store for the whole corpus: runs, examples, sources, checker results
+and judge verdicts across every generation run.
+
+The timestamped folders stay the working copy the checkers run on; generate_json.py,
+run_checkers.py and eval.py additionally write what they produce here, so questions
+that span runs become a single query instead of a glob over every results.json.
+Snippets and raw responses are kept once, in the blob store next to the database
+(see blob_store.py); the tables hold their hashes.
+
+Usage:
+    python corpus_db.py import                 # load every existing run folder
+    python corpus_db.py disagree ty mypy       # examples where ty and mypy disagree
+    python corpus_db.py summary                # per checker/version outcome and verdict counts
+    python corpus_db.py leaderboard --by checker family
+    python corpus_db.py trend                  # judged accuracy per checker, run by run
+"""
+import os
+import glob
+import json
+import sqlite3
+import argparse
+import datetime
+import threading
+from typing import Dict, List, Any, Optional
+
+from blob_store import BLOB_DIR_NAME, BlobStore, load_examples
+
+BASE_GEN_DIR = "generated_examples"
+DB_PATH = os.path.join(BASE_GEN_DIR, "corpus.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    timestamp TEXT,
+    model TEXT,
+    raw_response_blob TEXT
+);
+CREATE TABLE IF NOT EXISTS examples (
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    example_id TEXT NOT NULL,
+    full_content_blob TEXT NOT NULL,
+    metadata TEXT,
+    model TEXT,
+    valid INTEGER,
+    duplicate_of TEXT,
+    PRIMARY KEY (run_id, example_id)
+);
+CREATE TABLE IF NOT EXISTS checker_results (
+    run_id TEXT NOT NULL,
+    example_id TEXT NOT NULL,
+    checker TEXT NOT NULL,
+    version TEXT,
+    output TEXT,
+    reports_error INTEGER,
+    PRIMARY KEY (run_id, example_id, checker)
+);
+CREATE TABLE IF NOT EXISTS verdicts (
+    run_id TEXT NOT NULL,
+    example_id TEXT NOT NULL,
+    checker TEXT NOT NULL,
+    judge_model TEXT,
+    verdict TEXT,
+    reason TEXT,
+    created_at TEXT,
+    agreement REAL
+);
+CREATE TABLE IF NOT EXISTS verdict_cache (
+    cache_key TEXT PRIMARY KEY,
+    judge_model TEXT,
+    prompt_version TEXT,
+    verdict TEXT,
+    reason TEXT,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS leaderboard (
+    run_id TEXT NOT NULL,
+    checker TEXT NOT NULL,
+    version TEXT NOT NULL,
+    family TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    judged INTEGER NOT NULL,
+    updated_at TEXT,
+    PRIMARY KEY (run_id, checker, version, family)
+);
+CREATE INDEX IF NOT EXISTS idx_examples_example_id ON examples(example_id);
+CREATE INDEX IF NOT EXISTS idx_examples_full_content_blob ON examples(full_content_blob);
+CREATE INDEX IF NOT EXISTS idx_results_checker_version ON checker_results(checker, version);
+CREATE INDEX IF NOT EXISTS idx_results_example_id ON checker_results(example_id);
+CREATE INDEX IF NOT EXISTS idx_verdicts_example ON verdicts(run_id, example_id, checker);
+CREATE INDEX IF NOT EXISTS idx_verdicts_verdict ON verdicts(verdict);
+"""
+
+
+LEADERBOARD_GROUPS = ["checker", "version", "family", "run_id"]
+
+
+def _flag(value: Optional[bool]) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+class CorpusStore:
+    """Thread-safe handle on the corpus database; usable as a context manager."""
+
+    def __init__(self, path: str = DB_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self.blobs = BlobStore(os.path.join(directory, BLOB_DIR_NAME))
+        self._move_text_to_blobs()
+        self._conn.executescript(SCHEMA)
+        # Databases created before self-consistency voting lack the agreement column
+        if "agreement" not in self._columns("verdicts"):
+            self._conn.execute("ALTER TABLE verdicts ADD COLUMN agreement REAL")
+
+    def _columns(self, table: str) -> set:
+        return {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+
+    def _move_text_to_blobs(self) -> None:
+        """Databases created before the blob store hold raw responses and snippets inline; keeps only their hashes."""
+        with self._conn:
+            if "raw_response" in self._columns("runs"):
+                self._conn.execute("ALTER TABLE runs ADD COLUMN raw_response_blob TEXT")
+                for row in self._conn.execute("SELECT run_id, raw_response FROM runs WHERE raw_response IS NOT NULL").fetchall():
+                    self._conn.execute(
+                        "UPDATE runs SET raw_response_blob = ? WHERE run_id = ?",
+                        (self.blobs.put(row["raw_response"]), row["run_id"]),
+                    )
+                self._conn.execute("ALTER TABLE runs DROP COLUMN raw_response")
+            if "source_hash" in self._columns("examples"):
+                # source_hash was already the sha256 of the text, i.e. its blob hash
+                for row in self._conn.execute("SELECT content FROM sources").fetchall():
+                    self.blobs.put(row["content"])
+                self._conn.execute("DROP INDEX IF EXISTS idx_examples_source_hash")
+                self._conn.execute("ALTER TABLE examples RENAME COLUMN source_hash TO full_content_blob")
+                self._conn.execute("DROP TABLE sources")
+
+    def __enter__(self) -> "CorpusStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def add_run(self, run_id: str, data: Dict[str, Any]) -> None:
+        """Stores a run from its examples.json content (replacing a previous import of it); text goes to the blob store."""
+        raw_response = data.get("raw_response")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?)",
+                (run_id, data.get("timestamp"), data.get("model_used"), raw_response and self.blobs.put(raw_response)),
+            )
+            for ex in data.get("examples", []):
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO examples VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run_id, ex["id"], self.blobs.put(ex["full_content"]), ex.get("metadata"), ex.get("model"),
+                        _flag(ex.get("valid")), ex.get("duplicate_of"),
+                    ),
+                )
+
+    def full_content(self, run_id: str, example_id: str) -> Optional[str]:
+        """The saved snippet (metadata header and code) of an example, or None if it is not stored."""
+        rows = self.query(
+            "SELECT full_content_blob FROM examples WHERE run_id = ? AND example_id = ?", (run_id, example_id)
+        )
+        return self.blobs.get(rows[0]["full_content_blob"]) if rows else None
+
+    def raw_response(self, run_id: str) -> Optional[str]:
+        """The model response a run was parsed from, or None if it is not stored."""
+        rows = self.query("SELECT raw_response_blob FROM runs WHERE run_id = ?", (run_id,))
+        return self.blobs.get(rows[0]["raw_response_blob"]) if rows and rows[0]["raw_response_blob"] else None
+
+    def add_checker_results(self, run_id: str, results: List[Dict[str, Any]], versions: Dict[str, str]) -> None:
+        """Stores the entries of a results.json for `run_id`."""
+        from run_checkers import reports_error
+
+        with self._lock, self._conn:
+            for entry in results:
+                example_id = os.path.splitext(entry["filename"])[0]
+                for checker, output in entry["outputs"].items():
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO checker_results VALUES (?, ?, ?, ?, ?, ?)",
+                        (run_id, example_id, checker, versions.get(checker), output, _flag(reports_error(checker, output))),
+                    )
+
+    def add_verdict(
+        self, run_id: str, example_id: str, checker: str, judge_model: str, verdict: str, reason: str,
+        agreement: Optional[float] = None,
+    ) -> None:
+        """`agreement` is the share of judge samples behind a voted verdict (None for a single sample)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO verdicts VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, example_id, checker, judge_model, verdict, reason, datetime.datetime.now().isoformat(), agreement),
+            )
+
+    def get_cached_verdict(self, cache_key: str) -> Optional[Dict[str, str]]:
+        """A previously stored verdict for `cache_key` (see verdict_cache.cache_key), or None."""
+        rows = self.query("SELECT verdict, reason FROM verdict_cache WHERE cache_key = ?", (cache_key,))
+        return {"verdict": rows[0]["verdict"], "reason": rows[0]["reason"]} if rows else None
+
+    def cache_verdict(self, cache_key: str, judge_model: str, prompt_version: str, verdict: str, reason: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdict_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key, judge_model, prompt_version, verdict, reason, datetime.datetime.now().isoformat()),
+            )
+
+    def import_run(self, run_dir: str) -> None:
+        """Loads a run folder's examples.json and, if present, results.json."""
+        run_id = os.path.basename(os.path.normpath(run_dir))
+        self.add_run(run_id, load_examples(os.path.join(run_dir, "examples.json")))
+        results_path = os.path.join(run_dir, "results.json")
+        if os.path.exists(results_path):
+            with open(results_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.add_checker_results(run_id, data.get("results", []), data.get("checker_versions", {}))
+
+    def refresh_leaderboard(self, run_id: str, versions: Optional[Dict[str, str]] = None) -> int:
+        """
+        Recomputes the leaderboard aggregates of one run from its latest verdicts, replacing
+        any earlier ones, so the all-runs totals cost O(new results) to keep current.
+        Checker versions come from `versions` or the run's checker_results; returns the rows written.
+        """
+        from analytics import feature_family
+
+        rows = self.query(
+            """
+            SELECT v.example_id, v.checker, v.verdict, r.version
+            FROM verdicts v
+            JOIN (SELECT MAX(rowid) AS rowid FROM verdicts WHERE run_id = ? GROUP BY example_id, checker) latest
+              ON v.rowid = latest.rowid
+            LEFT JOIN checker_results r
+              ON r.run_id = v.run_id AND r.example_id = v.example_id AND r.checker = v.checker
+            """,
+            (run_id,),
+        )
+        totals: Dict[tuple, List[int]] = {}
+        for row in rows:
+            if row["verdict"] not in ("CORRECT", "INCORRECT"):
+                continue
+            version = (versions or {}).get(row["checker"]) or row["version"] or "unknown"
+            bucket = totals.setdefault((row["checker"], version, feature_family(row["example_id"])), [0, 0])
+            bucket[0] += row["verdict"] == "CORRECT"
+            bucket[1] += 1
+
+        now = datetime.datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM leaderboard WHERE run_id = ?", (run_id,))
+            self._conn.executemany(
+                "INSERT INTO leaderboard VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, *key, correct, judged, now) for key, (correct, judged) in totals.items()],
+            )
+        return len(totals)
+
+    def leaderboard(self, by: List[str]) -> List[sqlite3.Row]:
+        """Judged accuracy over every aggregated run, grouped by any of checker, version, family, run_id."""
+        unknown = set(by) - set(LEADERBOARD_GROUPS)
+        if unknown or not by:
+            raise ValueError(f"Cannot group the leaderboard by {sorted(unknown) or by}; use {LEADERBOARD_GROUPS}")
+        columns = ", ".join(by)
+        return self.query(
+            f"""
+            SELECT {columns}, SUM(correct) AS correct, SUM(judged) AS judged
+            FROM leaderboard GROUP BY {columns}
+            ORDER BY SUM(correct) * 1.0 / SUM(judged) DESC, {columns}
+            """
+        )
+
+    def leaderboard_trend(self) -> List[sqlite3.Row]:
+        """Judged accuracy per run and checker, oldest run first."""
+        return self.query(
+            """
+            SELECT run_id, checker, SUM(correct) AS correct, SUM(judged) AS judged
+            FROM leaderboard GROUP BY run_id, checker ORDER BY run_id, checker
+            """
+        )
+
+    def latest_run(self) -> Optional[str]:
+        rows = self.query("SELECT MAX(run_id) AS run_id FROM runs")
+        return rows[0]["run_id"] if rows else None
+
+    def disagreements(self, checker_a: str, checker_b: str) -> List[sqlite3.Row]:
+        """Every (run, example) where `checker_a` and `checker_b` reach different outcomes."""
+        return self.query(
+            """
+            SELECT a.run_id, a.example_id,
+                   a.reports_error AS a_error, b.reports_error AS b_error,
+                   a.version AS a_version, b.version AS b_version
+            FROM checker_results a
+            JOIN checker_results b ON a.run_id = b.run_id AND a.example_id = b.example_id
+            WHERE a.checker = ? AND b.checker = ?
+              AND a.reports_error IS NOT NULL AND b.reports_error IS NOT NULL
+              AND a.reports_error != b.reports_error
+            ORDER BY a.run_id, a.example_id
+            """,
+            (checker_a, checker_b),
+        )
+
+    def summary(self) -> List[sqlite3.Row]:
+        """Outcome and verdict counts per checker and version; only the latest verdict of each output counts, as in the leaderboard."""
+        return self.query(
+            """
+            SELECT r.checker, COALESCE(r.version, '?') AS version, COUNT(*) AS files,
+                   SUM(r.reports_error = 1) AS flagged,
+                   SUM(r.reports_error = 0) AS clean,
+                   COALESCE(SUM(v.correct), 0) AS correct,
+                   COALESCE(SUM(v.judged), 0) AS judged
+            FROM checker_results r
+            LEFT JOIN (
+                SELECT run_id, example_id, checker,
+                       verdict = 'CORRECT' AS correct, verdict IN ('CORRECT', 'INCORRECT') AS judged
+                FROM verdicts
+                JOIN (SELECT MAX(rowid) AS latest FROM verdicts GROUP BY run_id, example_id, checker)
+                  ON verdicts.rowid = latest
+            ) v USING (run_id, example_id, checker)
+            GROUP BY r.checker, r.version
+            ORDER BY r.checker, r.version
+            """
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the SQLite corpus of generated examples")
+    parser.add_argument("--db", default=DB_PATH, help=f"Database file (default: {DB_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Import run folders into the database")
+    imp.add_argument("--base-dir", default=BASE_GEN_DIR, help=f"Generation runs directory (default: {BASE_GEN_DIR})")
+    dis = sub.add_parser("disagree", help="List examples where two checkers reach different outcomes")
+    dis.add_argument("checker_a")
+    dis.add_argument("checker_b")
+    sub.add_parser("summary", help="Outcome and verdict counts per checker and version")
+    board = sub.add_parser("leaderboard", help="Judged accuracy across all evaluated runs")
+    board.add_argument("--by", nargs="+", default=["checker"], choices=LEADERBOARD_GROUPS)
+    board.add_argument("--rebuild", action="store_true", help="Recompute the aggregates of every run from the stored verdicts first")
+    sub.add_parser("trend", help="Judged accuracy per checker, run by run")
+    args = parser.parse_args()
+
+    with CorpusStore(args.db) as store:
+        if args.command == "import":
+            run_dirs = sorted(os.path.dirname(p) for p in glob.glob(os.path.join(args.base_dir, "*", "examples.json")))
+            for run_dir in run_dirs:
+                store.import_run(run_dir)
+            print(f"[INFO] Imported {len(run_dirs)} runs into {args.db}")
+
+        elif args.command == "disagree":
+            rows = store.disagreements(args.checker_a, args.checker_b)
+            for row in rows:
+                a = "error" if row["a_error"] else "ok"
+                b = "error" if row["b_error"] else "ok"
+                print(f"{row['run_id']}  {row['example_id']:<50} {args.checker_a}={a} {args.checker_b}={b}")
+            print(f"[INFO] {len(rows)} disagreements between {args.checker_a} and {args.checker_b}")
+
+        elif args.command == "leaderboard":
+            if args.rebuild:
+                run_ids = [row["run_id"] for row in store.query("SELECT DISTINCT run_id FROM verdicts ORDER BY run_id")]
+                for run_id in run_ids:
+                    store.refresh_leaderboard(run_id)
+                print(f"[INFO] Rebuilt leaderboard aggregates for {len(run_ids)} runs")
+            label = " / ".join(args.by)
+            print(f"{label:<50} | {'Accuracy':<10} | {'Score'}")
+            print("-" * 80)
+            for row in store.leaderboard(args.by):
+                key = " / ".join(str(row[column]) for column in args.by)
+                print(f"{key:<50} | {row['correct'] / row['judged'] * 100:5.1f}%     | {row['correct']}/{row['judged']}")
+
+        elif args.command == "trend":
+            trend: Dict[str, Dict[str, str]] = {}
+            for row in store.leaderboard_trend():
+                trend.setdefault(row["run_id"], {})[row["checker"]] = f"{row['correct'] / row['judged'] * 100:5.1f}% of {row['judged']}"
+            checkers = sorted({checker for cells in trend.values() for checker in cells})
+            print(f"{'Run':<20} | " + " | ".join(f"{checker:<12}" for checker in checkers))
+            print("-" * (23 + 15 * len(checkers)))
+            for run_id, cells in trend.items():
+                print(f"{run_id:<20} | " + " | ".join(f"{cells.get(checker, 'n/a'):<12}" for checker in checkers))
+
+        else:
+            print(f"{'Checker':<10} | {'Version':<25} | {'Files':<5} | {'Flagged':<7} | {'Clean':<5} | {'Judged correct'}")
+            print("-" * 80)
+            for row in store.summary():
+                print(
+                    f"{row['checker']:<10} | {row['version']:<25} | {row['files']:<5} | "
+                    f"{row['flagged'] or 0:<7} | {row['clean'] or 0:<5} | {row['correct']}/{row['judged']}"
+                )
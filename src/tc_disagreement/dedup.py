@@ -0,0 +1,357 @@
+"""
+Near-duplicate detection for generated examples across all generation runs.
+
+Each snippet is canonicalized through its AST: comments, docstrings and string contents
+disappear and locally defined identifiers are numbered per kind in order of appearance
+(classes C0, C1, ..., functions and methods f0, ..., parameters a0, ..., anything else
+v0, ...). Imported names and builtins are kept, since they carry the typing feature
+under test. Snippets that do not parse (older runs saved prose around the code) have
+the offending lines removed until they do; prose never reaches the fingerprint. Two
+fingerprints are stored per example in generated_examples/dedup_index.json:
+- an exact sha256 of the canonical source
+- a MinHash signature of its token shingles, bucketed with LSH for fast lookup
+
+DEFAULT_THRESHOLD and SHINGLE_SIZE were measured on the four runs in generated_examples,
+over cross-run pairs labelled by topic (49 pairs regenerating the same divergence, 521
+unrelated ones). The most similar unrelated pair shares 18% of its 4-token shingles; at
+0.22 none of the unrelated pairs and 31 of the 49 repeats are flagged. That margin is
+thin, so near-duplicates are only flagged (`duplicate_of`); run_checkers.py and
+generation_loop.py still check them unless given --skip-duplicates.
+
+Usage:
+    python dedup.py build                 # (re)index every run in generated_examples
+    python dedup.py check [RUN_DIR]       # report near-duplicates in a run
+    python dedup.py --threshold 0.3 check # stricter; DEDUP_THRESHOLD sets the default everywhere
+"""
+import os
+import re
+import ast
+import sys
+import json
+import glob
+import random
+import hashlib
+import argparse
+import builtins
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+from blob_store import load_examples
+
+BASE_GEN_DIR = "generated_examples"
+INDEX_PATH = os.path.join(BASE_GEN_DIR, "dedup_index.json")
+
+# 256 permutations keep the estimation error (~0.025 at these similarities) below the margin
+NUM_PERM = 256
+BANDS = 128  # 2 rows per band: pairs at the default threshold become LSH candidates ~99% of the time
+SHINGLE_SIZE = 4
+DEFAULT_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0.22"))
+# Bumped whenever canonicalize() changes, so indexes built by an older version get rebuilt
+CANONICAL_VERSION = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)
+]
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+class _Canonicalizer(ast.NodeTransformer):
+    """Strips docstrings and string contents and renames locally defined identifiers per kind: C0, f0, a0, v0, ..."""
+
+    def __init__(self, external: Set[str], tree: ast.AST):
+        self.external = external
+        self.names: Dict[str, str] = {}
+        self.counts: Dict[str, int] = {}
+        # A name's kind comes from where it is defined, wherever it is first used
+        self.kinds: Dict[str, str] = {}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ClassDef):
+                self.kinds.setdefault(node.name, "C")
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self.kinds.setdefault(node.name, "f")
+        for node in ast.walk(tree):
+            if isinstance(node, ast.arg):
+                self.kinds.setdefault(node.arg, "a")
+
+    def rename(self, name: str) -> str:
+        if name in self.external or (name.startswith("__") and name.endswith("__")):
+            return name
+        if name not in self.names:
+            kind = self.kinds.get(name, "v")
+            self.names[name] = f"{kind}{self.counts.get(kind, 0)}"
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+        return self.names[name]
+
+    def _strip_docstring(self, node: ast.AST) -> None:
+        body = getattr(node, "body", None)
+        if (
+            body
+            and isinstance(body[0], ast.Expr)
+            and isinstance(body[0].value, ast.Constant)
+            and isinstance(body[0].value.value, str)
+        ):
+            node.body = body[1:] or [ast.Pass()]
+
+    def visit_Module(self, node: ast.Module) -> ast.AST:
+        self._strip_docstring(node)
+        return self.generic_visit(node)
+
+    def _visit_def(self, node: Any) -> ast.AST:
+        self._strip_docstring(node)
+        node.name = self.rename(node.name)
+        return self.generic_visit(node)
+
+    visit_FunctionDef = _visit_def
+    visit_AsyncFunctionDef = _visit_def
+    visit_ClassDef = _visit_def
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        node.id = self.rename(node.id)
+        return node
+
+    def visit_arg(self, node: ast.arg) -> ast.AST:
+        node.arg = self.rename(node.arg)
+        return self.generic_visit(node)
+
+    def visit_keyword(self, node: ast.keyword) -> ast.AST:
+        if node.arg is not None:
+            node.arg = self.rename(node.arg)
+        return self.generic_visit(node)
+
+    def visit_Constant(self, node: ast.Constant) -> ast.AST:
+        if isinstance(node.value, str):
+            node.value = ""
+        return node
+
+    def visit_JoinedStr(self, node: ast.JoinedStr) -> ast.AST:
+        return ast.copy_location(ast.Constant(value=""), node)
+
+    def visit_Attribute(self, node: ast.Attribute) -> ast.AST:
+        # typing.Protocol and friends keep their attribute name
+        if not (isinstance(node.value, ast.Name) and node.value.id in self.external):
+            node.attr = self.rename(node.attr)
+        return self.generic_visit(node)
+
+
+def _parse_code(code: str) -> Optional[ast.Module]:
+    """AST of `code`, dropping the line each SyntaxError points at until the rest parses."""
+    lines = code.splitlines()
+    while True:
+        try:
+            return ast.parse("\n".join(lines))
+        except (SyntaxError, ValueError) as e:
+            if not lines:
+                return None
+            lineno = getattr(e, "lineno", None) or len(lines)
+            del lines[min(max(lineno, 1), len(lines)) - 1]
+
+
+def canonicalize(code: str) -> str:
+    """Canonical source of `code`; only its parseable lines are used, an empty string if there are none."""
+    tree = _parse_code(code)
+    if tree is None:
+        return ""
+
+    external = set(dir(builtins))
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                external.add((alias.asname or alias.name).split(".")[0])
+    return ast.unparse(_Canonicalizer(external, tree).visit(tree))
+
+
+def exact_hash(canonical: str) -> str:
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def minhash(canonical: str) -> List[int]:
+    """MinHash signature over token shingles of the canonical source."""
+    tokens = TOKEN_PATTERN.findall(canonical)
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(max(1, len(tokens) - SHINGLE_SIZE + 1))}
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for s in shingles
+    ]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def _bands(signature: List[int]) -> List[str]:
+    rows = len(signature) // BANDS
+    return [f"{i}:{hash(tuple(signature[i * rows:(i + 1) * rows]))}" for i in range(BANDS)]
+
+
+class DedupIndex:
+    """Exact and MinHash/LSH fingerprints of every indexed example, persisted as JSON."""
+
+    def __init__(self, path: Optional[str] = INDEX_PATH, threshold: float = DEFAULT_THRESHOLD):
+        """`path=None` gives an in-memory index that cannot be saved."""
+        self.path = path
+        self.threshold = threshold
+        self.entries: List[Dict[str, Any]] = []
+        self._exact: Dict[str, int] = {}
+        self._buckets: Dict[str, List[int]] = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if self.compatible(data):
+                for entry in data.get("entries", []):
+                    self._insert(entry)
+            else:
+                print(f"[WARNING] {path} was built with different parameters; run 'python dedup.py build'.")
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def compatible(data: Dict[str, Any]) -> bool:
+        """Whether a saved index was fingerprinted the way this version fingerprints."""
+        return (
+            data.get("num_perm") == NUM_PERM
+            and data.get("shingle_size") == SHINGLE_SIZE
+            and data.get("canonical_version") == CANONICAL_VERSION
+        )
+
+    def _insert(self, entry: Dict[str, Any]) -> None:
+        position = len(self.entries)
+        self.entries.append(entry)
+        self._exact.setdefault(entry["exact"], position)
+        for band in _bands(entry["minhash"]):
+            self._buckets.setdefault(band, []).append(position)
+
+    @staticmethod
+    def fingerprint(code: str) -> Tuple[str, List[int]]:
+        canonical = canonicalize(code)
+        return exact_hash(canonical), minhash(canonical)
+
+    def find(self, code: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Best indexed match for `code` at or above the threshold, with its similarity (1.0 for exact)."""
+        exact, signature = self.fingerprint(code)
+        if exact in self._exact:
+            return self.entries[self._exact[exact]], 1.0
+
+        candidates = {pos for band in _bands(signature) for pos in self._buckets.get(band, [])}
+        best: Optional[Tuple[Dict[str, Any], float]] = None
+        for pos in candidates:
+            score = similarity(signature, self.entries[pos]["minhash"])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (self.entries[pos], score)
+        return best
+
+    def add(self, example_id: str, run: str, code: str) -> None:
+        exact, signature = self.fingerprint(code)
+        self._insert({"id": example_id, "run": run, "exact": exact, "minhash": signature})
+
+    def save(self) -> None:
+        if not self.path:
+            raise ValueError("In-memory DedupIndex has no path to save to")
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            "num_perm": NUM_PERM, "shingle_size": SHINGLE_SIZE, "canonical_version": CANONICAL_VERSION,
+            "entries": self.entries,
+        }
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+
+def mark_duplicates(examples: List[Dict[str, Any]], index: DedupIndex, run: str) -> List[Dict[str, Any]]:
+    """
+    Returns copies of `examples` with `duplicate_of` ("<run>/<id>") and `similarity` set for
+    near-duplicates of indexed examples (or of earlier ones in the same batch). New examples are
+    added to `index` in memory; call `index.save()` to persist them.
+    """
+    marked = []
+    for ex in examples:
+        match = index.find(ex["full_content"])
+        if match is not None:
+            entry, score = match
+            marked.append({**ex, "duplicate_of": f"{entry['run']}/{entry['id']}", "similarity": round(score, 3)})
+        else:
+            index.add(ex["id"], run, ex["full_content"])
+            marked.append(ex)
+    return marked
+
+
+def duplicate_ids(run_dir: str) -> List[str]:
+    """Ids marked as near-duplicates in `<run_dir>/examples.json`."""
+    json_path = os.path.join(run_dir, "examples.json")
+    if not os.path.exists(json_path):
+        return []
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [ex["id"] for ex in data.get("examples", []) if ex.get("duplicate_of")]
+
+
+def build_index(base_dir: str = BASE_GEN_DIR, path: str = INDEX_PATH, threshold: float = DEFAULT_THRESHOLD) -> DedupIndex:
+    """Rebuilds the index from every run, oldest first, so the first occurrence is the original."""
+    if os.path.exists(path):
+        os.remove(path)
+    index = DedupIndex(path, threshold)
+    for json_path in sorted(glob.glob(os.path.join(base_dir, "*", "examples.json"))):
+        data = load_examples(json_path)
+        run = os.path.basename(os.path.dirname(json_path))
+        for ex in data.get("examples", []):
+            if index.find(ex["full_content"]) is None:
+                index.add(ex["id"], run, ex["full_content"])
+    index.save()
+    return index
+
+
+def load_index(path: str = INDEX_PATH, base_dir: str = BASE_GEN_DIR, threshold: float = DEFAULT_THRESHOLD) -> DedupIndex:
+    """
+    The persisted index matching at `threshold`, built from all existing runs the first
+    time it is needed and rebuilt if it was fingerprinted with other parameters.
+    """
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            if DedupIndex.compatible(json.load(f)):
+                return DedupIndex(path, threshold)
+        print(f"[INFO] {path} was built with different parameters, rebuilding...")
+    else:
+        print(f"[INFO] Building deduplication index {path}...")
+    return build_index(base_dir, path, threshold)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect near-duplicate examples across generation runs")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help=f"MinHash similarity threshold (default: {DEFAULT_THRESHOLD})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help=f"Rebuild {INDEX_PATH} from every run")
+    check = sub.add_parser("check", help="Report near-duplicates of a run against all earlier runs")
+    check.add_argument("run_dir", nargs="?", help="Generation folder (default: the latest one)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = build_index(threshold=args.threshold)
+        print(f"[INFO] Indexed {len(index)} distinct examples into {INDEX_PATH}")
+        sys.exit(0)
+
+    if args.run_dir:
+        run_dir = args.run_dir
+    else:
+        from run_checkers import get_latest_generation_dir
+        run_dir = get_latest_generation_dir()
+    run = os.path.basename(os.path.normpath(run_dir))
+
+    # Compare only against runs that came before this one
+    index = DedupIndex(None, args.threshold)
+    for json_path in sorted(glob.glob(os.path.join(BASE_GEN_DIR, "*", "examples.json"))):
+        earlier = os.path.basename(os.path.dirname(json_path))
+        if earlier >= run:
+            continue
+        for ex in load_examples(json_path).get("examples", []):
+            index.add(ex["id"], earlier, ex["full_content"])
+
+    examples = load_examples(os.path.join(run_dir, "examples.json")).get("examples", [])
+    marked = mark_duplicates(examples, index, run)
+    duplicates = [ex for ex in marked if ex.get("duplicate_of")]
+    print(f"[INFO] {len(duplicates)} of {len(examples)} examples in {run} are near-duplicates:")
+    for ex in duplicates:
+        print(f"  = {ex['id']} ~ {ex['duplicate_of']} ({ex['similarity']:.2f})")
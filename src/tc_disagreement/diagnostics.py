@@ -0,0 +1,76 @@
+"""
+Parses raw type checker output into structured diagnostics.
+
+Understands the three output styles of the configured checkers:
+- mypy / zuban:  path:12: error: Message  [code]
+- pyrefly:       ERROR Message [code]      followed by   --> path:12:5
+- ty:            error[code]: Message      followed by   --> path:12:5
+"""
+import re
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+MYPY_LINE = re.compile(
+    r"^(?P<path>[^\s:][^:]*):(?P<line>\d+):(?:(?P<col>\d+):)? (?P<severity>error|warning|note): "
+    r"(?P<message>.*?)(?:\s+\[(?P<code>[\w-]+)\])?$"
+)
+PYREFLY_HEAD = re.compile(r"^\s*(?P<severity>ERROR|WARN|INFO) (?P<message>.*?)(?: \[(?P<code>[\w-]+)\])?$")
+PYREFLY_SUMMARY = re.compile(r"^\s*INFO \d+ errors?")
+TY_HEAD = re.compile(r"^(?P<severity>error|warning|info)\[(?P<code>[\w-]+)\]: (?P<message>.*)$")
+LOCATION = re.compile(r"^\s*--> (?P<path>.+?):(?P<line>\d+):(?P<col>\d+)")
+
+SEVERITIES = {"error": "error", "ERROR": "error", "warning": "warning", "WARN": "warning",
+              "note": "note", "info": "note", "INFO": "note"}
+
+
+class Diagnostic(BaseModel):
+    severity: str  # "error", "warning" or "note"
+    code: Optional[str] = None
+    line: Optional[int] = None
+    column: Optional[int] = None
+    message: str
+
+
+def parse_diagnostics(output: str) -> List[Diagnostic]:
+    """All diagnostics in one checker output, in order; summary and code-frame lines are skipped."""
+    diagnostics: List[Diagnostic] = []
+    for raw in output.splitlines():
+        match = MYPY_LINE.match(raw)
+        if match:
+            diagnostics.append(Diagnostic(
+                severity=SEVERITIES[match["severity"]],
+                code=match["code"],
+                line=int(match["line"]),
+                column=int(match["col"]) if match["col"] else None,
+                message=match["message"].strip(),
+            ))
+            continue
+
+        match = LOCATION.match(raw)
+        if match:
+            # Attach the location to the diagnostic header it belongs to
+            if diagnostics and diagnostics[-1].line is None:
+                diagnostics[-1].line = int(match["line"])
+                diagnostics[-1].column = int(match["col"])
+            continue
+
+        if PYREFLY_SUMMARY.match(raw):
+            continue
+        match = TY_HEAD.match(raw) or PYREFLY_HEAD.match(raw)
+        if match:
+            diagnostics.append(Diagnostic(
+                severity=SEVERITIES[match["severity"]],
+                code=match["code"],
+                message=match["message"].strip(),
+            ))
+    return diagnostics
+
+
+def count(diagnostics: List[Diagnostic], severity: str) -> int:
+    return sum(1 for d in diagnostics if d.severity == severity)
+
+
+def error_codes(diagnostics: List[Diagnostic]) -> List[str]:
+    """Distinct codes of error-level diagnostics, sorted."""
+    return sorted({d.code for d in diagnostics if d.severity == "error" and d.code})
@@ -1,17 +1,27 @@
 import os
 import json
+import hashlib
 import glob
 import sys
-from typing import List, Dict
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import List, Dict, Tuple, Optional
 from pydantic import HttpUrl
 
-import time
-import random
 
 # Import your existing Gemini Agent class
 # Assuming your main pydantic file is named 'agent.py'
 try:
     from agent import GetAccessToGemini 
+    from corpus_db import CorpusStore
+    from archive import ResultArchive, record_key
+    from verdict_cache import cache_key
+    from checkpoint import JudgeCheckpoint
+    from compact import compact_inputs, estimate_tokens, print_savings, savings
+    from expectations import LOCAL_JUDGE, prejudge, print_unmatched, unmatched_checkers
 except ImportError:
     # If the import fails, we define a dummy or ask user to fix filename
     print("[ERROR] Could not import GetAccessToGemini. Make sure 'agent.py' exists.")
@@ -51,13 +61,88 @@ VERDICT: [CORRECT/INCORRECT]
 REASON: [One sentence explanation]
 """
 
+# Batched variant: the source once, every checker output, one structured verdict per output
+BATCH_JUDGE_PROMPT_TEMPLATE = f"""
+You are an expert Python Static Analysis Judge (PEP 484).
+Your goal is to determine, for each Type Checker output below, if it is CORRECT or INCORRECT.
+
+### 1. The Source Code
+(Pay attention to the logic and any obvious type safety violations)
+{TICK}python
+{{source_code}}
+{TICK}
+
+### 2. The Type Checker Outputs
+{{outputs}}
+
+### 3. Your Task
+Determine for every output whether it is **CORRECT** based on strict Python typing rules.
+- If the code has a bug/overlap and the tool reports an error -> CORRECT.
+- If the code has a bug and the tool says "Success" -> INCORRECT (False Negative).
+- If the code is safe and the tool reports an error -> INCORRECT (False Positive).
+
+Return a JSON array with exactly one object per Output ID: the id, the verdict
+(CORRECT or INCORRECT) and a one sentence reason.
+"""
+
+OUTPUT_BLOCK_TEMPLATE = f"""Output ID: {{output_id}}
+{TICK}text
+{{tool_output}}
+{TICK}"""
+
+# Cross-file variant: several files per request, Output IDs are "<example id>/<checker>"
+MULTI_FILE_JUDGE_PROMPT_TEMPLATE = f"""
+You are an expert Python Static Analysis Judge (PEP 484).
+Your goal is to determine, for each Type Checker output below, if it is CORRECT or INCORRECT.
+Several independent files follow; judge every output only against the source of its own file.
+
+{{files}}
+
+### Your Task
+Determine for every output whether it is **CORRECT** based on strict Python typing rules.
+- If the code has a bug/overlap and the tool reports an error -> CORRECT.
+- If the code has a bug and the tool says "Success" -> INCORRECT (False Negative).
+- If the code is safe and the tool reports an error -> INCORRECT (False Positive).
+
+Return a JSON array with exactly one object per Output ID: the id, the verdict
+(CORRECT or INCORRECT) and a one sentence reason.
+"""
+
+FILE_BLOCK_TEMPLATE = f"""### File: {{file_id}}
+{TICK}python
+{{source_code}}
+{TICK}
+
+{{outputs}}"""
+
+JUDGE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "STRING"},
+            "verdict": {"type": "STRING", "enum": ["CORRECT", "INCORRECT"]},
+            "reason": {"type": "STRING"}
+        },
+        "required": ["id", "verdict", "reason"]
+    }
+}
+
+JUDGE_GENERATION_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": JUDGE_SCHEMA
+}
+
+# Self-consistency samples need some diversity to be worth voting on
+VOTE_GENERATION_CONFIG = {"temperature": 0.7}
+
 def get_latest_results_file() -> str:
     """Finds the results.json in the most recent generated folder."""
     if not os.path.exists(BASE_GEN_DIR):
         return None
         
     subdirs = [os.path.join(BASE_GEN_DIR, d) for d in os.listdir(BASE_GEN_DIR) 
-               if os.path.isdir(os.path.join(BASE_GEN_DIR, d))]
+               if os.path.exists(os.path.join(BASE_GEN_DIR, d, "examples.json"))]
     
     if not subdirs:
         return None
@@ -66,104 +151,446 @@ def get_latest_results_file() -> str:
     results_path = os.path.join(latest_dir, "results.json")
     return results_path if os.path.exists(results_path) else None
 
-def evaluate_tool(agent, source_code: str, tool_name: str, output: str) -> Dict:
-    """Sends a prompt to Gemini to judge the tool output with Retry Logic."""
+def predict(agent, prompt: str, generation_config: Optional[Dict], slots: Optional[threading.Semaphore]) -> str:
+    """
+    agent.predict, holding one of `slots` for the duration of the request. Every judge
+    request of a run shares the same semaphore, so vote samples count against
+    --concurrency like any other request.
+    """
+    with slots if slots is not None else nullcontext():
+        return agent.predict(prompt, generation_config)
+
+def evaluate_tool(
+    agent, source_code: str, tool_name: str, output: str, generation_config: Optional[Dict] = None,
+    slots: Optional[threading.Semaphore] = None,
+) -> Dict:
+    """Sends a prompt to Gemini to judge the tool output."""
     prompt = JUDGE_PROMPT_TEMPLATE.format(
         source_code=source_code,
         tool_name=tool_name,
         tool_output=output
     )
     
-    max_retries = 5
-    base_delay = 2
+    try:
+        response = predict(agent, prompt, generation_config, slots)
+    except ValueError as e:
+        # Transient failures were already retried by the agent's retry policy
+        return {"verdict": "ERROR", "reason": f"API Failed: {e}"}
 
-    for attempt in range(max_retries):
-        try:
-            response = agent.predict(prompt)
-            
-            lines = response.splitlines()
-            verdict = "UNKNOWN"
-            reason = "Could not parse reason"
-            
-            for line in lines:
-                if line.startswith("VERDICT:"):
-                    verdict = line.replace("VERDICT:", "").strip().upper()
-                if line.startswith("REASON:"):
-                    reason = line.replace("REASON:", "").strip()
-                    
-            return {"verdict": verdict, "reason": reason}
-
-        except Exception as e:
-            error_msg = str(e)
-            if "503" in error_msg or "429" in error_msg:
-                if attempt < max_retries - 1:
-                    sleep_time = (base_delay * (2 ** attempt)) + (random.random() * 0.5)
-                    print(f"    [Warn] API Busy (503). Retrying in {sleep_time:.1f}s...")
-                    time.sleep(sleep_time)
-                    continue
+    lines = response.splitlines()
+    verdict = "UNKNOWN"
+    reason = "Could not parse reason"
+    
+    for line in lines:
+        if line.startswith("VERDICT:"):
+            verdict = line.replace("VERDICT:", "").strip().upper()
+        if line.startswith("REASON:"):
+            reason = line.replace("REASON:", "").strip()
             
-            return {"verdict": "ERROR", "reason": f"API Failed: {error_msg}"}
+    return {"verdict": verdict, "reason": reason}
+
+def evaluate_tool_voting(
+    agent, source_code: str, tool_name: str, output: str, votes: int, slots: Optional[threading.Semaphore] = None,
+) -> Dict:
+    """
+    Self-consistency judging: samples the judge until one verdict holds a majority of `votes`.
+    Each round sends, concurrently, only as many samples as could still decide the vote
+    (2 of 3 up front, a third only on a split); `slots` bounds how many are actually in flight.
+    The result carries `agreement`, the share of usable samples behind the verdict, and
+    `samples`, the number of judge calls made.
+    """
+    needed = votes // 2 + 1
+    counts = Counter()
+    samples = []
+    with ThreadPoolExecutor(max_workers=needed) as pool:
+        while len(samples) < votes:
+            leader = max(counts.values(), default=0)
+            if leader >= needed:
+                break
+            launch = min(needed - leader, votes - len(samples))
+            for result in pool.map(
+                lambda _: evaluate_tool(agent, source_code, tool_name, output, VOTE_GENERATION_CONFIG, slots), range(launch)
+            ):
+                samples.append(result)
+                if result["verdict"] in ("CORRECT", "INCORRECT"):
+                    counts[result["verdict"]] += 1
+
+    if not counts:
+        return {**samples[0], "samples": len(samples)}
+    # Ties go to the verdict sampled first
+    verdict, support = counts.most_common(1)[0]
+    reason = next(s["reason"] for s in samples if s["verdict"] == verdict)
+    return {"verdict": verdict, "reason": reason, "agreement": round(support / sum(counts.values()), 3), "samples": len(samples)}
+
+def parse_batch_verdicts(text: str, output_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Reads a JSON verdict array; returns the well-formed verdicts for known ids.
+    Raises ValueError if the text is not a JSON array at all.
+    """
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Judge response is not valid JSON: {e}") from e
+    if not isinstance(items, list):
+        raise ValueError("Judge response is not a JSON array")
+
+    verdicts = {}
+    for item in items:
+        if not isinstance(item, dict) or item.get("id") not in output_ids:
+            continue
+        verdict = str(item.get("verdict", "")).strip().upper()
+        if verdict in ("CORRECT", "INCORRECT"):
+            verdicts[item["id"]] = {"verdict": verdict, "reason": str(item.get("reason", "")).strip()}
+    return verdicts
+
+def evaluate_tool_or_vote(
+    agent, source_code: str, tool_name: str, output: str, votes: int = 1, slots: Optional[threading.Semaphore] = None,
+) -> Dict:
+    """Judges one output, by self-consistency voting when `votes` > 1."""
+    if votes > 1:
+        return evaluate_tool_voting(agent, source_code, tool_name, output, votes, slots)
+    return evaluate_tool(agent, source_code, tool_name, output, slots=slots)
+
+def evaluate_file(
+    agent, source_code: str, outputs: Dict[str, str], votes: int = 1, slots: Optional[threading.Semaphore] = None,
+) -> Dict[str, Dict]:
+    """
+    Judges every checker output of one file in a single request. Outputs the model
+    did not return a usable verdict for are judged one by one, voting when `votes` > 1.
+    """
+    prompt = BATCH_JUDGE_PROMPT_TEMPLATE.format(
+        source_code=source_code,
+        outputs="\n\n".join(
+            OUTPUT_BLOCK_TEMPLATE.format(output_id=tool, tool_output=output) for tool, output in outputs.items()
+        )
+    )
+
+    try:
+        verdicts = parse_batch_verdicts(
+            predict(agent, prompt, JUDGE_GENERATION_CONFIG, slots), list(outputs)
+        )
+    except ValueError as e:
+        print(f"  [WARN] Batched judge failed ({e}); judging each checker separately.")
+        verdicts = {}
+
+    missing = [tool for tool in outputs if tool not in verdicts]
+    if verdicts and missing:
+        print(f"  [WARN] No batched verdict for {', '.join(missing)}; judging separately.")
+    for tool in missing:
+        verdicts[tool] = evaluate_tool_or_vote(agent, source_code, tool, outputs[tool], votes, slots)
+    return {tool: verdicts[tool] for tool in outputs}
+
+# Identifies the judge prompts in verdict cache keys; changes whenever a template changes
+PROMPT_VERSION = hashlib.sha256(
+    (JUDGE_PROMPT_TEMPLATE + BATCH_JUDGE_PROMPT_TEMPLATE + MULTI_FILE_JUDGE_PROMPT_TEMPLATE).encode("utf-8")
+).hexdigest()[:12]
+
+def judge_version(compact: bool, context_lines: Optional[int]) -> str:
+    """PROMPT_VERSION plus what compact_inputs cuts, since the same output is judged on a different prompt."""
+    return f"{PROMPT_VERSION}:compact={int(compact)}:context={'all' if context_lines is None else context_lines}"
+
+def file_block(file_id: str, source_code: str, outputs: Dict[str, str]) -> str:
+    return FILE_BLOCK_TEMPLATE.format(
+        file_id=file_id,
+        source_code=source_code,
+        outputs="\n\n".join(
+            OUTPUT_BLOCK_TEMPLATE.format(output_id=f"{file_id}/{tool}", tool_output=output)
+            for tool, output in outputs.items()
+        )
+    )
+
+def plan_batches(files: List[Tuple[Dict, str]], token_budget: int) -> List[List[Tuple[Dict, str]]]:
+    """Groups (file_entry, source) pairs in order so each batch's prompt stays within `token_budget`."""
+    overhead = estimate_tokens(MULTI_FILE_JUDGE_PROMPT_TEMPLATE)
+    batches, current, used = [], [], overhead
+    for file_entry, source_code in files:
+        file_id = os.path.splitext(file_entry["filename"])[0]
+        cost = estimate_tokens(file_block(file_id, source_code, file_entry["outputs"]))
+        if current and used + cost > token_budget:
+            batches.append(current)
+            current, used = [], overhead
+        current.append((file_entry, source_code))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def judge_files(
+    agent, files: List[Tuple[Dict, str]], votes: int = 1, slots: Optional[threading.Semaphore] = None,
+) -> Dict[str, Dict[str, Dict]]:
+    """
+    Judges several files in one request; returns filename -> checker -> verdict.
+    Files left without complete verdicts (malformed or truncated output) are split
+    in half and retried, down to evaluate_file for a single file.
+    """
+    if len(files) == 1:
+        file_entry, source_code = files[0]
+        return {file_entry["filename"]: evaluate_file(agent, source_code, file_entry["outputs"], votes, slots)}
+
+    ids = {}
+    blocks = []
+    for file_entry, source_code in files:
+        file_id = os.path.splitext(file_entry["filename"])[0]
+        ids[file_entry["filename"]] = file_id
+        blocks.append(file_block(file_id, source_code, file_entry["outputs"]))
+    prompt = MULTI_FILE_JUDGE_PROMPT_TEMPLATE.format(files="\n\n".join(blocks))
+    output_ids = [f"{ids[entry['filename']]}/{tool}" for entry, _ in files for tool in entry["outputs"]]
+
+    try:
+        verdicts = parse_batch_verdicts(
+            predict(agent, prompt, JUDGE_GENERATION_CONFIG, slots), output_ids
+        )
+    except ValueError as e:
+        print(f"[WARN] Judge batch of {len(files)} files failed ({e}); splitting it.")
+        verdicts = {}
+
+    judged, incomplete = {}, []
+    for file_entry, source_code in files:
+        file_id = ids[file_entry["filename"]]
+        file_verdicts = {tool: verdicts.get(f"{file_id}/{tool}") for tool in file_entry["outputs"]}
+        if all(file_verdicts.values()):
+            judged[file_entry["filename"]] = file_verdicts
+        else:
+            incomplete.append((file_entry, source_code))
+
+    if incomplete:
+        if verdicts:
+            print(f"[WARN] {len(incomplete)} of {len(files)} files came back without complete verdicts; retrying them.")
+        middle = (len(incomplete) + 1) // 2
+        for part in (incomplete[:middle], incomplete[middle:]):
+            if part:
+                judged.update(judge_files(agent, part, votes, slots))
+    return judged
 
 def main():
     # 1. Setup Agent
-    token = os.environ.get("GEMINI_API_KEY")
-    if not token:
-        print("[ERROR] GEMINI_API_KEY not set.")
-        return
-
-    # Use Flash for speed
+    # Use Flash for speed; without GEMINI_API_KEY a key pool from the flags must stand in
     agent = GetAccessToGemini(
         model="gemini-2.5-flash", 
-        token=token,
+        token=os.environ.get("GEMINI_API_KEY", ""),
         api_base=HttpUrl("https://generativelanguage.googleapis.com/v1beta"),
         timeout=30.0,
     )
 
-    # 2. Load Results
-    results_path = get_latest_results_file()
-    if not results_path:
-        print("[ERROR] No results.json found. Run 'run_checkers.py' first.")
+    parser = argparse.ArgumentParser(description="Judge type checker outputs with Gemini")
+    agent.add_connection_arguments(parser)
+    parser.add_argument("--archive", default=None, help="Judge results from this archive instead of the latest results.json; verdicts are written back to it")
+    parser.add_argument("--run", default=None, help="Run id to judge from the archive (default: its latest run)")
+    parser.add_argument("--batch", action="store_true", help="Judge all checker outputs of a file in one request")
+    parser.add_argument("--batch-tokens", type=int, default=0, help="Pack several files into one judge request of up to about this many prompt tokens (default: off)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Judge requests in flight at once (default: 4)")
+    parser.add_argument("--no-cache", action="store_true", help="Ask the judge even when an equivalent output already has a verdict")
+    parser.add_argument("--votes", type=int, default=1, help="Judge each output by majority of up to this many samples, stopping once decided (default: 1, no voting)")
+    parser.add_argument("--compact", action="store_true", help="Send checker outputs without paths, code frames and repeats (see compact.py)")
+    parser.add_argument("--context-lines", type=int, default=None, help="Send only the source lines this close to a reported line (default: the whole file)")
+    parser.add_argument("--prejudge", action="store_true", help="Settle outputs that clearly match their EXPECTED metadata locally; only the rest go to the judge")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted evaluation from its checkpoint instead of starting over")
+    args = parser.parse_args()
+    agent.apply_args(args)
+    if not agent.has_credentials:
+        print("[ERROR] GEMINI_API_KEY not set and no key pool configured (GEMINI_API_KEYS or --api-keys-file).")
         return
 
-    with open(results_path, "r") as f:
-        data = json.load(f)
+    # 2. Load Results
+    archive = None
+    if args.archive:
+        if not os.path.exists(args.archive):
+            print(f"[ERROR] Archive not found: {args.archive}")
+            return
+        archive = ResultArchive(args.archive)
+        run_id = args.run or max((key.split("/", 1)[0] for key in archive.keys()), default=None)
+        results = list(archive.records(f"{run_id}/")) if run_id else []
+        if not results:
+            print(f"[ERROR] No results for run '{run_id}' in {args.archive}.")
+            return
+        data = {"checkers_used": list(results[0]["outputs"]), "checker_versions": results[0].get("checker_versions", {})}
+        results_path = f"{args.archive} ({run_id})"
+        checkpoint_path = f"{args.archive}.{run_id}.checkpoint.jsonl"
+    else:
+        results_path = get_latest_results_file()
+        if not results_path:
+            print("[ERROR] No results.json found. Run 'run_checkers.py' first.")
+            return
+
+        with open(results_path, "r") as f:
+            data = json.load(f)
+
+        results = data.get("results", [])
+        run_id = os.path.basename(os.path.dirname(results_path))
+        checkpoint_path = os.path.join(os.path.dirname(results_path), "judge_checkpoint.jsonl")
 
-    results = data.get("results", [])
+    store = CorpusStore()
+    checkpoint = JudgeCheckpoint(checkpoint_path, agent.model, resume=args.resume, local_model=LOCAL_JUDGE)
     print(f"--- AI Judge Evaluation on {len(results)} Files ---")
     print(f"Source: {results_path}\n")
+    if args.resume:
+        print(f"[INFO] Resuming from {checkpoint_path} ({len(checkpoint)} verdicts).\n")
 
     # 3. Evaluation Loop
     tool_stats = {t: {"correct": 0, "total": 0} for t in data.get("checkers_used", [])}
 
+    files = []
     for file_entry in results:
-        filepath = file_entry["filepath"]
         filename = file_entry["filename"]
         
-        # Read the source code freshly
-        try:
-            with open(filepath, "r") as src:
-                source_code = src.read()
-        except FileNotFoundError:
-            print(f"[WARN] Source file not found: {filepath}")
-            continue
-            
-        print(f"Evaluating {filename}...")
-        
+        if archive is not None and file_entry.get("source") is not None:
+            source_code = file_entry["source"]
+        else:
+            # Read the source code freshly
+            filepath = file_entry.get("filepath", filename)
+            try:
+                with open(filepath, "r") as src:
+                    source_code = src.read()
+            except FileNotFoundError:
+                print(f"[WARN] Source file not found: {filepath}")
+                continue
+        files.append((file_entry, source_code))
+
+    # What the judge prompts show of each file; verdict cache keys use the raw source and outputs,
+    # with the compaction settings folded into the version
+    prompts = [
+        compact_inputs(source_code, file_entry["outputs"], args.compact, args.context_lines)
+        for file_entry, source_code in files
+    ]
+    if args.compact or args.context_lines is not None:
+        print_savings(*savings([((source_code, entry["outputs"]), prompt) for (entry, source_code), prompt in zip(files, prompts)]))
+        print()
+
+    version = judge_version(args.compact, args.context_lines)
+
+    def cached_verdict(source_code: str, output: str):
+        if args.no_cache:
+            return None
+        return store.get_cached_verdict(cache_key(source_code, output, agent.model, version))
+
+    local_verdicts: Dict[str, Dict[str, Dict]] = {}
+    if args.prejudge:
+        not_run: Counter = Counter()
+        without_expectation: Counter = Counter()
+        for file_entry, source_code in files:
+            local_verdicts[file_entry["filename"]] = prejudge(source_code, file_entry["outputs"])
+            missing, uncovered = unmatched_checkers(source_code, file_entry["outputs"])
+            not_run.update(missing)
+            without_expectation.update(uncovered)
+        settled = sum(len(verdicts) for verdicts in local_verdicts.values())
+        total = sum(len(file_entry["outputs"]) for file_entry, _ in files)
+        print(f"[INFO] Pre-judge settled {settled} of {total} outputs from the EXPECTED metadata.")
+        print_unmatched(not_run, without_expectation)
+        print()
+
+    # Outputs that already have a verdict (checkpointed, pre-judged or cached), or repeat an earlier
+    # output, are left out of the batched requests
+    pending = []
+    seen_keys = set()
+    for (file_entry, source_code), (prompt_source, prompt_outputs) in zip(files, prompts):
+        outputs = {}
+        settled = {**local_verdicts.get(file_entry["filename"], {}), **checkpoint.verdicts_for(file_entry["filename"])}
         for tool, output in file_entry["outputs"].items():
-            eval_result = evaluate_tool(agent, source_code, tool, output)
-            
-            is_correct = "CORRECT" in eval_result["verdict"]
-            status_icon = "✅" if is_correct else "❌"
-            
-            # Update stats
-            if tool not in tool_stats: tool_stats[tool] = {"correct": 0, "total": 0}
-            tool_stats[tool]["total"] += 1
-            if is_correct:
-                tool_stats[tool]["correct"] += 1
+            if tool in settled:
+                continue
+            key = cache_key(source_code, output, agent.model, version)
+            if args.no_cache or (key not in seen_keys and cached_verdict(source_code, output) is None):
+                outputs[tool] = prompt_outputs[tool]
+            seen_keys.add(key)
+        pending.append(({**file_entry, "outputs": outputs}, prompt_source))
+
+    def judge_entry(
+        file_entry: Dict, source_code: str, prompt: Tuple[str, Dict[str, str]], pending_outputs: Dict[str, str],
+    ) -> Tuple[Dict[str, Dict], int]:
+        """All verdicts for one file (checkpointed, pre-judged, batched, cached or per checker); returns them with the cache hit count."""
+        filename = file_entry["filename"]
+        prompt_source, prompt_outputs = prompt
+        verdicts = dict(local_verdicts.get(filename, {}))
+        verdicts.update({tool: {**result, "resumed": True} for tool, result in checkpoint.verdicts_for(filename).items()})
+        if filename in batch_verdicts:
+            verdicts.update(batch_verdicts[filename])
+        elif args.batch and pending_outputs:
+            verdicts.update(evaluate_file(agent, prompt_source, pending_outputs, args.votes, slots))
+
+        hits = 0
+        for tool, output in file_entry["outputs"].items():
+            if tool not in verdicts:
+                # Checked again here so identical outputs judged earlier in this run are reused too
+                cached = cached_verdict(source_code, output)
+                if cached is not None:
+                    hits += 1
+                    verdicts[tool] = {**cached, "cached": True}
+                else:
+                    verdicts[tool] = evaluate_tool_or_vote(agent, prompt_source, tool, prompt_outputs[tool], args.votes, slots)
+            eval_result = verdicts[tool]
+            judged_now = not (eval_result.get("cached") or eval_result.get("resumed") or eval_result.get("local"))
+            if judged_now and eval_result["verdict"] in ("CORRECT", "INCORRECT"):
+                store.cache_verdict(
+                    cache_key(source_code, output, agent.model, version), agent.model, version,
+                    eval_result["verdict"], eval_result["reason"],
+                )
+
+        # Persisted as soon as the file is done, not when it is printed, so an interruption loses nothing judged
+        new = {tool: result for tool, result in verdicts.items() if not result.get("resumed")}
+        for tool, eval_result in new.items():
+            store.add_verdict(
+                run_id, os.path.splitext(filename)[0], tool, LOCAL_JUDGE if eval_result.get("local") else agent.model,
+                eval_result["verdict"], eval_result["reason"], eval_result.get("agreement"),
+            )
+        if new:
+            checkpoint.record(filename, new)
+        return verdicts, hits
+
+    cache_hits = 0
+    resumed = 0
+    batch_verdicts: Dict[str, Dict[str, Dict]] = {}
+    # Shared by every judge request, vote samples included, so at most --concurrency are in flight
+    slots = threading.BoundedSemaphore(max(1, args.concurrency))
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        if args.batch_tokens:
+            to_judge = [item for item in pending if item[0]["outputs"]]
+            batches = plan_batches(to_judge, args.batch_tokens)
+            print(f"[INFO] Packed {len(to_judge)} files into {len(batches)} judge requests.\n")
+            for judged in pool.map(lambda batch: judge_files(agent, batch, args.votes, slots), batches):
+                batch_verdicts.update(judged)
+
+        # Files are judged concurrently but reported in order, so the output matches a sequential run
+        results_in_order = pool.map(
+            lambda item: judge_entry(item[0][0], item[0][1], item[1], item[2][0]["outputs"]),
+            zip(files, prompts, pending),
+        )
+        for (file_entry, source_code), (verdicts, hits) in zip(files, results_in_order):
+            filename = file_entry["filename"]
+            cache_hits += hits
+            print(f"Evaluating {filename}...")
+
+            for tool in file_entry["outputs"]:
+                eval_result = verdicts[tool]
+                resumed += bool(eval_result.get("resumed"))
+
+                is_correct = eval_result["verdict"] == "CORRECT"
+                status_icon = "✅" if is_correct else "❌"
                 
-            print(f"  {tool:<10} | {status_icon} {eval_result['verdict']} | {eval_result['reason'][:60]}...")
+                # Update stats
+                if tool not in tool_stats: tool_stats[tool] = {"correct": 0, "total": 0}
+                tool_stats[tool]["total"] += 1
+                if is_correct:
+                    tool_stats[tool]["correct"] += 1
+                    
+                agreement = f" ({eval_result['agreement']:.0%} agree)" if eval_result.get("agreement") is not None else ""
+                if eval_result.get("local"):
+                    agreement = " (local)"
+                print(f"  {tool:<10} | {status_icon} {eval_result['verdict']}{agreement} | {eval_result['reason'][:60]}...")
+
+            if archive is not None:
+                archive.put(record_key(run_id, filename), {**file_entry, "verdicts": verdicts})
 
-        print("-" * 60)
+            print("-" * 60)
+
+    # Only this run's aggregates are recomputed; the all-runs totals sum them
+    store.refresh_leaderboard(run_id, data.get("checker_versions"))
+    store.close()
+    if archive is not None:
+        archive.flush()
+    if cache_hits:
+        print(f"\n[INFO] Reused {cache_hits} cached verdicts.")
+    if resumed:
+        print(f"[INFO] Took {resumed} verdicts from the checkpoint.")
 
     # 4. Final Scorecard
     print("\n" + "="*40)
@@ -179,6 +606,11 @@ def main():
         else:
             print(f"{tool:<15} | N/A        | 0/0")
     print("="*40)
+    print("[INFO] All-runs leaderboard: 'uv run corpus_db.py leaderboard --by checker version family', trend: 'uv run corpus_db.py trend'")
+
+    agent.metrics.print_summary("JUDGE CALL METRICS")
+    if agent.key_pool is not None:
+        agent.key_pool.print_usage()
 
 if __name__ == "__main__":
     main()
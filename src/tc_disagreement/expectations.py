@@ -0,0 +1,253 @@
+"""
+Offline pre-judge from the EXPECTED metadata of each example.
+
+Every example opens with a comment header stating, per checker, what the author
+expects it to report:
+    # EXPECTED:
+    #   mypy: Error on `handler: KwargProtocol = simple_func`
+    #   zuban: No error. `reveal_type(result1)` is `Literal[True]`.
+    # REASON: ...
+The header is parsed into structured expectations (error or not, the source lines an
+error is expected on, the revealed type expected at each reveal_type call) and
+compared with the diagnostics a checker actually printed. An output is a clear
+match only if its error/no-error outcome agrees and every line and revealed type
+the expectation names can be located and agrees too. Hedged expectations ("might",
+"likely", ...) are never clear-cut.
+
+EXPECTED is the author's prediction, not ground truth. So eval.py --prejudge
+accepts only clear matches as CORRECT locally. Contradictions and everything
+ambiguous still go to the LLM judge. The CLI prints the first-pass tally without
+calling the judge.
+
+Expectations are matched to checkers by name. Headers written for other checkers
+(the generation prompt asks about pyright and pyre, run_checkers.py runs pyrefly
+and ty) cannot settle anything; both tools report these names so the reach of the
+pre-judge is visible.
+
+Usage:
+    python expectations.py                         # latest run with results
+    python expectations.py path/to/results.json --show
+"""
+import os
+import re
+import json
+import glob
+import argparse
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+import diagnostics
+import run_checkers
+from generate_json import split_metadata
+
+BASE_GEN_DIR = "generated_examples"
+
+# Judge model recorded for verdicts settled here, in the corpus database and judge checkpoints
+LOCAL_JUDGE = "local-expectations"
+
+HEDGES = re.compile(r"\b(might|may|maybe|likely|possibly|probably|perhaps|could|or similar|subtle|depends|unclear)\b", re.IGNORECASE)
+NO_ERROR = re.compile(r"^\s*(no errors?|success|ok|passes)\b", re.IGNORECASE)
+ERROR = re.compile(r"^\s*errors?\b", re.IGNORECASE)
+LINE_NUMBER = re.compile(r"\blines? (\d+)")
+ERROR_ON = re.compile(r"\b[Ee]rror on `([^`]+)`")
+# `reveal_type(x)` is `int`, `reveal_type(x)` -> `int`, `x` -> `int`
+REVEAL = re.compile(r"`(?:reveal_type\()?(?P<expr>[^`]+?)\)?`\s*(?:is|->|would show|should be)\s*`(?P<type>[^`]+)`")
+REVEALED_NOTE = re.compile(r'^(?:Revealed type is "(?P<mypy>.*)"|revealed type: (?P<pyrefly>.*))$')
+MODULE_QUALIFIER = re.compile(r"\b[\w-]+(?:\.[\w-]+)*\.(?=[A-Za-z_])")
+
+
+class Expectation(BaseModel):
+    checker: str
+    behavior: str
+    error: Optional[bool] = None  # None when the behavior states no outcome
+    hedged: bool = False
+    lines: List[int] = Field(default_factory=list)  # source lines an error is expected on
+    revealed: Dict[int, str] = Field(default_factory=dict)  # reveal_type line -> expected type
+    unresolved: List[str] = Field(default_factory=list)  # references not found in the source
+
+
+def metadata_header(source_code: str) -> str:
+    """The leading comment block of an example, where '# EXPECTED:' and '# REASON:' live."""
+    header = []
+    for line in source_code.splitlines():
+        if line.strip() and not line.lstrip().startswith("#"):
+            break
+        header.append(line)
+    return "\n".join(header)
+
+
+def _source_lines(source_code: str, snippet: str) -> List[int]:
+    """Numbers of the code lines containing `snippet`; comment lines (the header itself) are skipped."""
+    return [
+        n for n, text in enumerate(source_code.splitlines(), start=1)
+        if snippet in text and not text.lstrip().startswith("#")
+    ]
+
+
+def parse_expectations(source_code: str) -> Dict[str, Expectation]:
+    """Structured expectations of an example, by checker name as written in its header."""
+    expectations = {}
+    for item in split_metadata(metadata_header(source_code))["expected"]:
+        behavior = item["behavior"]
+        expectation = Expectation(
+            checker=item["checker"],
+            behavior=behavior,
+            error=False if NO_ERROR.match(behavior) else True if ERROR.match(behavior) else None,
+            hedged=bool(HEDGES.search(behavior)),
+            lines=[int(n) for n in LINE_NUMBER.findall(behavior)],
+        )
+        for snippet in ERROR_ON.findall(behavior):
+            found = _source_lines(source_code, snippet)
+            if found:
+                expectation.lines.extend(found)
+            else:
+                expectation.unresolved.append(snippet)
+        for match in REVEAL.finditer(behavior):
+            found = _source_lines(source_code, f"reveal_type({match['expr']})")
+            if len(found) == 1:
+                expectation.revealed[found[0]] = match["type"]
+            else:
+                expectation.unresolved.append(f"reveal_type({match['expr']})")
+        expectations[expectation.checker] = expectation
+    return expectations
+
+
+def type_members(type_text: str) -> frozenset:
+    """Order- and spelling-insensitive form of a type: Union[A, B], Optional[A] and A | B compare equal."""
+    text = MODULE_QUALIFIER.sub("", type_text.strip().rstrip("?")).replace(" ", "")
+    for alias in ("List", "Dict", "Set", "FrozenSet", "Tuple", "Type"):
+        text = re.sub(rf"\b{alias}\[", f"{alias.lower()}[", text)
+    if text.startswith("Optional[") and text.endswith("]"):
+        return type_members(text[len("Optional["):-1]) | {"None"}
+    if text.startswith("Union[") and text.endswith("]"):
+        parts = _split_top_level(text[len("Union["):-1], ",")
+    else:
+        parts = _split_top_level(text, "|")
+    if len(parts) == 1:
+        return frozenset(parts)
+    return frozenset().union(*(type_members(part) for part in parts))
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    parts, depth, current = [], 0, ""
+    for char in text:
+        depth += char == "["
+        depth -= char == "]"
+        if char == separator and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    return parts + [current]
+
+
+def match_output(expectation: Optional[Expectation], tool: str, output: str) -> Tuple[Optional[bool], str]:
+    """
+    (True, why) if the output clearly matches the expectation, (False, why) if it clearly
+    contradicts it, (None, why) if that cannot be decided locally.
+    """
+    if expectation is None:
+        return None, f"no expectation for {tool}"
+    if expectation.hedged or (expectation.error is None and not expectation.revealed):
+        return None, f"expectation is not clear-cut: {expectation.behavior}"
+    if expectation.unresolved:
+        return None, f"cannot locate {', '.join(expectation.unresolved)} in the source"
+    flagged = run_checkers.reports_error(tool, output)
+    if flagged is None:
+        return None, f"{tool} did not run"
+    if expectation.error is not None and flagged != expectation.error:
+        return False, f"expected {'an error' if expectation.error else 'no error'}, {tool} {'reported errors' if flagged else 'passed'}"
+
+    parsed = diagnostics.parse_diagnostics(output)
+    if expectation.lines:
+        error_lines = {d.line for d in parsed if d.severity == "error"}
+        if not error_lines & set(expectation.lines):
+            return False, f"expected an error on line {'/'.join(map(str, expectation.lines))}, got lines {sorted(error_lines) or 'none'}"
+    revealed = {}
+    for d in parsed:
+        note = REVEALED_NOTE.match(d.message) if d.severity == "note" else None
+        if note:
+            revealed[d.line] = note["mypy"] if note["mypy"] is not None else note["pyrefly"]
+    for line, expected_type in expectation.revealed.items():
+        if line not in revealed:
+            return None, f"no revealed type from {tool} on line {line}"
+        if type_members(revealed[line]) != type_members(expected_type):
+            return False, f"line {line}: expected `{expected_type}`, revealed `{revealed[line]}`"
+    checked = ", ".join(
+        name for name, used in (("outcome", expectation.error is not None), ("lines", expectation.lines),
+                                ("revealed types", expectation.revealed)) if used
+    )
+    return True, f"matches EXPECTED ({checked}): {expectation.behavior}"
+
+
+def prejudge(source_code: str, outputs: Dict[str, str]) -> Dict[str, Dict]:
+    """Local verdicts for the outputs that clearly match their expectation; the rest need the judge."""
+    expectations = parse_expectations(source_code)
+    verdicts = {}
+    for tool, output in outputs.items():
+        matched, why = match_output(expectations.get(tool), tool, output)
+        if matched:
+            verdicts[tool] = {"verdict": "CORRECT", "reason": f"Local pre-judge: {why}", "local": True}
+    return verdicts
+
+
+def unmatched_checkers(source_code: str, outputs: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """Checkers the EXPECTED header names that did not run, and checkers that ran without an expectation."""
+    expected = parse_expectations(source_code)
+    return sorted(set(expected) - set(outputs)), sorted(set(outputs) - set(expected))
+
+
+def print_unmatched(not_run: Counter, without_expectation: Counter) -> None:
+    """Warns about checker names that keep expectations and outputs apart, with their file counts."""
+    if not_run:
+        names = ", ".join(f"{name} ({n} files)" for name, n in sorted(not_run.items()))
+        print(f"[WARNING] EXPECTED headers name checkers that were not run: {names}.")
+    if without_expectation:
+        names = ", ".join(f"{name} ({n} files)" for name, n in sorted(without_expectation.items()))
+        print(f"[WARNING] No EXPECTED entry for: {names}; these outputs always go to the judge.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare checker outputs with the EXPECTED metadata, without the judge")
+    parser.add_argument("results", nargs="?", help="results.json (default: the latest run with results)")
+    parser.add_argument("--show", action="store_true", help="Print the outcome of every output")
+    args = parser.parse_args()
+
+    results_path = args.results or max(glob.glob(os.path.join(BASE_GEN_DIR, "*", "results.json")), default=None)
+    if not results_path:
+        print("[ERROR] No results.json found. Run 'run_checkers.py' first.")
+        raise SystemExit(1)
+    with open(results_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    tally: Dict[str, Dict[str, int]] = {}
+    not_run: Counter = Counter()
+    without_expectation: Counter = Counter()
+    for entry in data.get("results", []):
+        try:
+            with open(entry.get("filepath", entry["filename"]), "r", encoding="utf-8") as f:
+                source = f.read()
+        except FileNotFoundError:
+            print(f"[WARN] Source file not found: {entry.get('filepath')}")
+            continue
+        expectations = parse_expectations(source)
+        missing, uncovered = unmatched_checkers(source, entry["outputs"])
+        not_run.update(missing)
+        without_expectation.update(uncovered)
+        for tool, output in entry["outputs"].items():
+            matched, why = match_output(expectations.get(tool), tool, output)
+            outcome = {True: "matched", False: "contradicted", None: "ambiguous"}[matched]
+            counts = tally.setdefault(tool, {"matched": 0, "contradicted": 0, "ambiguous": 0})
+            counts[outcome] += 1
+            if args.show:
+                print(f"{entry['filename']:<55} {tool:<8} {outcome:<12} {why[:80]}")
+
+    print(f"\nSource: {results_path}")
+    print(f"{'Tool':<15} | {'Matched':<8} | {'Contradicted':<12} | {'Ambiguous (judge)'}")
+    print("-" * 60)
+    for tool, counts in tally.items():
+        print(f"{tool:<15} | {counts['matched']:<8} | {counts['contradicted']:<12} | {counts['ambiguous']}")
+    print()
+    print_unmatched(not_run, without_expectation)
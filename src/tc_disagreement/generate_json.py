@@ -2,90 +2,332 @@ import os
 import re
 import json
 import datetime
-from typing import List, Dict
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 
-def parse_generated_content(response_text: str) -> List[Dict[str, str]]:
-    """
-    Parses the raw LLM response into structured dictionaries.
-    Robustly handles splitting by '# id:' and filters out artifacts like '---'.
-    """
-    examples = []
+import blob_store
+import corpus_db
+import dedup
+import validate
+
+# Boundary of each example: "# id: <name>" at the start of a line
+ID_PATTERN = re.compile(r"^# id:\s*(?P<id>[\w-]+)", re.MULTILINE)
+
+def _parse_block(file_id: str, chunk: str) -> Optional[Dict[str, str]]:
+    """Separates one '# id:' block into metadata and code; None if it holds no code."""
+    chunk = chunk.strip()
     
-    # 1. Find all occurrences of "# id: <name>" to determine boundaries
-    id_pattern = re.compile(r"^# id:\s*(?P<id>[\w-]+)", re.MULTILINE)
-    matches = list(id_pattern.finditer(response_text))
+    # Line-by-line processing to separate Metadata from Code
+    lines = chunk.splitlines()
+    metadata_lines = []
+    code_lines = []
     
-    for i, match in enumerate(matches):
-        file_id = match.group("id")
-        start_index = match.start()
-        
-        # Determine the end of this current block
-        if i + 1 < len(matches):
-            end_index = matches[i+1].start()
-        else:
-            end_index = len(response_text)
-            
-        # Extract the raw chunk
-        chunk = response_text[start_index:end_index].strip()
-        
-        # 2. Line-by-line processing to separate Metadata from Code
-        lines = chunk.splitlines()
-        metadata_lines = []
-        code_lines = []
-        
-        capture_code = False
-        
-        for line in lines:
-            # CLEANING: Remove any lines that are just dashes (separator artifacts)
-            if "---" in line and len(line.strip()) < 5: 
-                continue
+    capture_code = False
+    
+    for line in lines:
+        # CLEANING: Remove any lines that are just dashes (separator artifacts)
+        if "---" in line and len(line.strip()) < 5: 
+            continue
 
-            stripped = line.strip()
+        stripped = line.strip()
+        
+        # Skip the ID line itself (we already have the ID)
+        if stripped.startswith(f"# id:"):
+            continue
             
-            # Skip the ID line itself (we already have the ID)
-            if stripped.startswith(f"# id:"):
+        # State Machine: Metadata -> Code
+        if not capture_code:
+            if stripped.startswith("#"):
+                metadata_lines.append(line)
+            elif stripped == "" or stripped.startswith("```"):
+                # Ignore empty lines or markdown fences before code starts
                 continue
-                
-            # State Machine: Metadata -> Code
-            if not capture_code:
-                if stripped.startswith("#"):
-                    metadata_lines.append(line)
-                elif stripped == "" or stripped.startswith("```"):
-                    # Ignore empty lines or markdown fences before code starts
-                    continue
-                else:
-                    # Found the start of code!
-                    capture_code = True
-                    code_lines.append(line)
             else:
-                # Inside code block
-                # Remove closing markdown fences
-                if stripped.startswith("```"):
-                    continue
+                # Found the start of code!
+                capture_code = True
                 code_lines.append(line)
+        else:
+            # Inside code block
+            # Remove closing markdown fences
+            if stripped.startswith("```"):
+                continue
+            code_lines.append(line)
 
-        # 3. Final Cleanup
-        full_code = "\n".join(code_lines).strip()
-        full_metadata = "\n".join(metadata_lines).strip()
-        
-        # Ensure we don't save empty files
-        if file_id and full_code:
-            examples.append({
-                "id": file_id,
-                "metadata": full_metadata,
-                "code": full_code,
-                "full_content": f"# id: {file_id}\n{full_metadata}\n\n{full_code}"
-            })
+    # Final Cleanup
+    full_code = "\n".join(code_lines).strip()
+    full_metadata = "\n".join(metadata_lines).strip()
     
+    # Ensure we don't save empty files
+    if not (file_id and full_code):
+        return None
+    return {
+        "id": file_id,
+        "metadata": full_metadata,
+        "code": full_code,
+        "full_content": f"# id: {file_id}\n{full_metadata}\n\n{full_code}"
+    }
+
+def _safe_scan_start(buf: str, scan: int) -> int:
+    """
+    Earliest position at which a boundary could still appear once more text arrives,
+    given that ID_PATTERN finds no match in `buf` from `scan`: the last (incomplete)
+    line, or a trailing "# id:" line still waiting for its id after whitespace.
+    """
+    safe = buf.rfind("\n") + 1
+    text_end = len(buf.rstrip())
+    header = text_end - len("# id:")
+    if header >= 0 and buf.startswith("# id:", header) and (header == 0 or buf[header - 1] == "\n"):
+        safe = min(safe, header)
+    return max(scan, safe)
+
+def iter_examples(chunks: Iterable[str]) -> Iterator[Dict[str, str]]:
+    """
+    Incremental version of parse_generated_content: consumes text chunks (e.g. from a
+    streamed response) and yields each example as soon as the next '# id:' boundary
+    arrives. Only the current block is kept in memory.
+    """
+    buf = ""
+    scan = 0
+    current_id: Optional[str] = None
+
+    def drain(final: bool) -> Iterator[Dict[str, str]]:
+        nonlocal buf, scan, current_id
+        while True:
+            match = ID_PATTERN.search(buf, scan)
+            if match is None:
+                if not final:
+                    scan = _safe_scan_start(buf, scan)
+                    if current_id is None:
+                        # Text before the first boundary is never needed
+                        buf, scan = buf[scan:], 0
+                return
+            if match.end() == len(buf) and not final:
+                # The id may continue in the next chunk
+                scan = match.start()
+                return
+
+            if current_id is not None:
+                example = _parse_block(current_id, buf[:match.start()])
+                if example:
+                    yield example
+            buf = buf[match.start():]
+            scan = match.end() - match.start()
+            current_id = match.group("id")
+
+    for piece in chunks:
+        if piece:
+            buf += piece
+            yield from drain(final=False)
+
+    yield from drain(final=True)
+    if current_id is not None:
+        example = _parse_block(current_id, buf)
+        if example:
+            yield example
+
+def parse_generated_content(response_text: str) -> List[Dict[str, str]]:
+    """
+    Parses the raw LLM response into structured dictionaries.
+    Robustly handles splitting by '# id:' and filters out artifacts like '---'.
+    """
+    return list(iter_examples([response_text]))
+
+# Gemini responseSchema for structured generation (OpenAPI subset, upper-case types)
+EXAMPLES_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "STRING", "description": "<area>-<specific-case>, letters, digits and dashes only"},
+            "expected": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "checker": {"type": "STRING"},
+                        "behavior": {"type": "STRING"}
+                    },
+                    "required": ["checker", "behavior"]
+                }
+            },
+            "reason": {"type": "STRING"},
+            "code": {"type": "STRING", "description": "Complete runnable Python code without the metadata comments"}
+        },
+        "required": ["id", "expected", "reason", "code"],
+        "propertyOrdering": ["id", "expected", "reason", "code"]
+    }
+}
+
+STRUCTURED_GENERATION_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": EXAMPLES_SCHEMA
+}
+
+STRUCTURED_PROMPT_SUFFIX = """
+Return the examples as a JSON array following the response schema: for each example give
+its id, one expected entry per type checker, the reason, and the complete runnable code
+(without the id/EXPECTED/REASON comment header).
+"""
+
+def build_metadata(expected: List[Dict[str, str]], reason: str) -> str:
+    """Renders expectations in the same '# EXPECTED:' comment layout the text format uses."""
+    lines = ["# EXPECTED:"]
+    lines += [f"#   {item['checker'].strip()}: {item['behavior'].strip()}" for item in expected]
+    reason_lines = reason.strip().splitlines() or [""]
+    lines.append(f"# REASON: {reason_lines[0].strip()}")
+    lines += [f"#         {line.strip()}" for line in reason_lines[1:]]
+    return "\n".join(lines)
+
+def split_metadata(metadata: str) -> Dict[str, Any]:
+    """Inverse of build_metadata: per-checker expectations and the reason text."""
+    expected = []
+    reason_lines = []
+    section = None
+    for line in metadata.splitlines():
+        body = line.lstrip("#").strip()
+        if body.startswith("EXPECTED:"):
+            section = "expected"
+        elif body.startswith("REASON:"):
+            section = "reason"
+            reason_lines.append(body[len("REASON:"):].strip())
+        elif section == "expected" and ":" in body:
+            checker, behavior = body.split(":", 1)
+            expected.append({"checker": checker.strip(), "behavior": behavior.strip()})
+        elif section == "reason" and body:
+            reason_lines.append(body)
+    return {"expected": expected, "reason": " ".join(reason_lines).strip()}
+
+def split_code(file_id: str, metadata: str, full_content: str) -> str:
+    """The code part of full_content: everything after the id line and the metadata header."""
+    header = f"# id: {file_id}\n{metadata}\n\n"
+    if full_content.startswith(header):
+        return full_content[len(header):]
+    # Edited by hand since it was saved; separate it again like a response block
+    block = _parse_block(file_id, full_content)
+    return block["code"] if block else ""
+
+def load_structured_content(response_text: str) -> List[Dict[str, str]]:
+    """
+    Loads a structured (JSON) generation response into the same dictionaries
+    parse_generated_content produces. Raises ValueError if the payload is not
+    a JSON array; individual malformed entries are skipped with a warning.
+    """
+    try:
+        items = json.loads(response_text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Structured response is not valid JSON: {e}") from e
+    if not isinstance(items, list):
+        raise ValueError(f"Structured response must be a JSON array, got {type(items).__name__}")
+
+    examples = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            print(f"[WARNING] Skipping structured entry {index}: not an object")
+            continue
+
+        file_id = re.sub(r"[^\w-]+", "-", str(item.get("id", "")).strip()).strip("-")
+        code = item.get("code")
+        expected = item.get("expected") or []
+        if not file_id or not isinstance(code, str) or not code.strip():
+            print(f"[WARNING] Skipping structured entry {index}: missing id or code")
+            continue
+        if not isinstance(expected, list) or not all(
+            isinstance(e, dict) and isinstance(e.get("checker"), str) and isinstance(e.get("behavior"), str)
+            for e in expected
+        ):
+            print(f"[WARNING] Skipping structured entry {index} ({file_id}): malformed expectations")
+            continue
+
+        full_code = "\n".join(
+            line for line in code.strip().splitlines() if not line.strip().startswith("```")
+        ).strip()
+        full_metadata = build_metadata(expected, str(item.get("reason", "")))
+        examples.append({
+            "id": file_id,
+            "metadata": full_metadata,
+            "code": full_code,
+            "full_content": f"# id: {file_id}\n{full_metadata}\n\n{full_code}"
+        })
+
     return examples
 
-def save_output(examples: List[Dict[str, str]], raw_response: str, model_name: str):
+def parse_response(response_text: str) -> List[Dict[str, str]]:
+    """Structured loader first, regex text parser as the fallback."""
+    try:
+        return load_structured_content(response_text)
+    except ValueError as e:
+        print(f"[INFO] {e}; falling back to the text parser.")
+        return parse_generated_content(response_text)
+
+# The "# id: ..." line heading an example's full content
+ID_LINE = re.compile(r"^# id: .*$", re.MULTILINE)
+
+def merge_examples(per_model: Dict[str, List[Dict[str, str]]]) -> List[Dict[str, str]]:
+    """
+    Merges examples produced by several models, tagging each with its model.
+    Only exact duplicates (same code ignoring whitespace) are dropped, keeping the first
+    occurrence; near-duplicates are left to dedup.py. Models often reuse ids for different
+    code, so a colliding id gets the model's name appended (and a counter if still taken).
+    """
+    merged = []
+    seen_ids = set()
+    seen_code = set()
+    duplicates = 0
+    renamed = 0
+
+    for model, examples in per_model.items():
+        for ex in examples:
+            code_key = "".join(ex["code"].split())
+            if code_key in seen_code:
+                duplicates += 1
+                continue
+            seen_code.add(code_key)
+            example = {**ex, "model": model}
+            if ex["id"] in seen_ids:
+                base = f"{ex['id']}-{re.sub(r'[^A-Za-z0-9]+', '-', model).strip('-')}"
+                example_id, n = base, 2
+                while example_id in seen_ids:
+                    example_id, n = f"{base}-{n}", n + 1
+                example["id"] = example_id
+                example["full_content"] = ID_LINE.sub(f"# id: {example_id}", ex["full_content"], count=1)
+                renamed += 1
+            seen_ids.add(example["id"])
+            merged.append(example)
+
+    if duplicates:
+        print(f"[INFO] Dropped {duplicates} duplicate examples across models.")
+    if renamed:
+        print(f"[INFO] Renamed {renamed} examples whose id another model already used.")
+    return merged
+
+def save_output(
+    examples: List[Dict[str, str]], raw_response: str, model_name: str,
+    dedup_threshold: float = dedup.DEFAULT_THRESHOLD,
+) -> str:
     """
     Saves the parsed examples to JSON and individual .py files.
+    Examples that do not compile or near-duplicate earlier ones are kept but marked;
+    run_checkers.py skips invalid ones, and near-duplicates with --skip-duplicates.
+    Returns the created run folder.
     """
+    examples = validate.validate_examples(examples)
+    invalid = [ex for ex in examples if not ex["valid"]]
+    if invalid:
+        print(f"[WARNING] {len(invalid)} examples do not compile and will not be checked:")
+        for ex in invalid:
+            print(f"  x {ex['id']}: {ex['validation_error']}")
+
     # 1. Create Timestamped Folder
     now = datetime.datetime.now()
     folder_name = now.strftime("%Y-%m-%d_%H-%M-%S")
+
+    index = dedup.load_index(threshold=dedup_threshold)
+    examples = dedup.mark_duplicates(examples, index, folder_name)
+    index.save()
+    duplicates = [ex for ex in examples if ex.get("duplicate_of")]
+    if duplicates:
+        print(f"[WARNING] {len(duplicates)} examples near-duplicate earlier ones (run_checkers.py --skip-duplicates leaves them out):")
+        for ex in duplicates:
+            print(f"  = {ex['id']} ~ {ex['duplicate_of']} ({ex['similarity']:.2f})")
     
     base_path = os.path.join("generated_examples", folder_name)
     source_files_path = os.path.join(base_path, "source_files")
@@ -113,7 +355,11 @@ def save_output(examples: List[Dict[str, str]], raw_response: str, model_name: s
     }
 
     with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, indent=4)
+        json.dump(blob_store.pack(output_data, blob_store.store_for(json_path)), f, indent=4)
     
     print(f"[INFO] Saved master JSON to: {json_path}")
+
+    with corpus_db.CorpusStore() as store:
+        store.add_run(folder_name, output_data)
     print(f"[INFO] Successfully saved {len(examples)} examples.")
+    return base_path
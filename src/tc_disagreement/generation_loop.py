@@ -0,0 +1,241 @@
+"""
+Closed-loop generation: keep asking for examples until the checkers really disagree.
+
+Each round generates a batch of snippets, runs the local type checkers on them,
+keeps only the snippets where the checkers disagree and feeds a summary of what
+was kept and rejected into the next prompt. The loop stops once the target number
+of disagreements or the time/token budget is reached, then saves the kept examples
+together with their results.json so eval.py can judge them directly.
+
+Usage:
+    python generation_loop.py --target 10 --max-rounds 5 --time-budget 900 --token-budget 500000
+"""
+import os
+import time
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Tuple
+
+from pydantic import HttpUrl
+
+import dedup
+import generate_json
+import run_checkers
+import validate
+from agent import EXPERT_PROMPT, GetAccessToGemini
+
+FEEDBACK_TEMPLATE = """
+
+### FEEDBACK FROM PREVIOUS ROUNDS
+The snippets were checked locally with: {checkers}.
+
+Confirmed disagreements (already collected, do NOT repeat these ids or patterns):
+{kept}
+
+Rejected because every checker reached the same outcome (avoid these patterns):
+{rejected}
+
+Generate NEW examples that explore different features or sharper variations,
+aiming for cases where these checkers report different outcomes.
+"""
+
+
+def summarize_outcomes(example: Dict[str, Any]) -> str:
+    """One line such as 'protocol-x: mypy=error, ty=ok'."""
+    outcomes = []
+    for tool, output in example["outputs"].items():
+        status = run_checkers.reports_error(tool, output)
+        outcomes.append(f"{tool}={'n/a' if status is None else 'error' if status else 'ok'}")
+    return f"{example['id']}: " + ", ".join(outcomes)
+
+
+def build_prompt(kept: List[Dict[str, Any]], rejected: List[Dict[str, Any]], structured: bool) -> str:
+    """EXPERT_PROMPT plus a summary of what the previous rounds produced."""
+    prompt = EXPERT_PROMPT
+    if kept or rejected:
+        prompt += FEEDBACK_TEMPLATE.format(
+            checkers=", ".join(run_checkers.CHECKERS),
+            kept="\n".join(f"- {summarize_outcomes(ex)}" for ex in kept) or "- (none yet)",
+            rejected="\n".join(f"- {summarize_outcomes(ex)}" for ex in rejected) or "- (none)",
+        )
+    if structured:
+        prompt += generate_json.STRUCTURED_PROMPT_SUFFIX
+    return prompt
+
+
+def check_examples(examples: List[Dict[str, str]], workdir: str, workers: int) -> List[Dict[str, Any]]:
+    """Writes each example to `workdir` and runs all checkers on it, files in parallel."""
+    def check(example: Dict[str, str]) -> Dict[str, Any]:
+        filepath = os.path.join(workdir, f"{example['id']}.py")
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(example["full_content"])
+        outputs, timings = run_checkers.check_file_timed(filepath)
+        return {**example, "filepath": filepath, "outputs": outputs, "timings": timings}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(check, examples))
+
+
+def run_loop(
+    agent: GetAccessToGemini,
+    target: int,
+    max_rounds: int,
+    time_budget: float,
+    token_budget: int,
+    workers: int,
+    structured: bool = True,
+    dedup_threshold: float = dedup.DEFAULT_THRESHOLD,
+    skip_duplicates: bool = False,
+) -> Tuple[List[Dict[str, Any]], List[str], int]:
+    """
+    Runs generation rounds until a stop condition; returns kept examples, raw responses and rounds done.
+    Near-duplicates of earlier examples are reported, and only left unchecked with `skip_duplicates`.
+    """
+    kept: List[Dict[str, Any]] = []
+    rejected: List[Dict[str, Any]] = []
+    responses: List[str] = []
+    seen_ids = set()
+    index = dedup.load_index(threshold=dedup_threshold)
+    start = time.monotonic()
+    rounds = 0
+
+    workdir = tempfile.mkdtemp(prefix="tc_disagreement_")
+    try:
+        while rounds < max_rounds and len(kept) < target:
+            if time.monotonic() - start >= time_budget:
+                print("[INFO] Time budget exhausted.")
+                break
+            if agent.metrics.summary()["total_tokens"] >= token_budget:
+                print("[INFO] Token budget exhausted.")
+                break
+
+            rounds += 1
+            print(f"\n--- Round {rounds} (kept {len(kept)}/{target}) ---")
+            try:
+                response = agent.predict(
+                    build_prompt(kept, rejected, structured),
+                    generation_config=generate_json.STRUCTURED_GENERATION_CONFIG if structured else None,
+                )
+            except ValueError as e:
+                print(f"[WARN] Generation failed: {e}")
+                continue
+            responses.append(response)
+
+            examples = [ex for ex in generate_json.parse_response(response) if ex["id"] not in seen_ids]
+            seen_ids.update(ex["id"] for ex in examples)
+            examples = validate.validate_examples(examples)
+            for ex in examples:
+                if not ex["valid"]:
+                    print(f"  x {ex['id']}: {ex['validation_error']}")
+            examples = dedup.mark_duplicates([ex for ex in examples if ex["valid"]], index, "loop")
+            for ex in examples:
+                if ex.get("duplicate_of"):
+                    print(f"  = {ex['id']} ~ {ex['duplicate_of']} ({ex['similarity']:.2f})")
+            if skip_duplicates:
+                examples = [ex for ex in examples if not ex.get("duplicate_of")]
+            print(f"[INFO] Parsed {len(examples)} new valid examples, running checkers...")
+
+            for example in check_examples(examples, workdir, workers):
+                if run_checkers.checkers_disagree(example["outputs"]):
+                    kept.append({**example, "round": rounds})
+                    print(f"  + {summarize_outcomes(example)}")
+                else:
+                    rejected.append(example)
+                    print(f"  - {summarize_outcomes(example)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return kept[:target], responses, rounds
+
+
+def relocate_outputs(outputs: Dict[str, str], checked_path: str, saved_path: str) -> Dict[str, str]:
+    """
+    Checker outputs of the file checked at `checked_path` (in the temporary workdir), as if
+    the checkers had run on `saved_path`: the file itself becomes its bare filename, like
+    run_checkers.py writes it, and any other workdir path points to the saved folder.
+    """
+    workdir = os.path.dirname(checked_path)
+    saved_dir = os.path.dirname(saved_path)
+    relocated = {}
+    for tool, output in outputs.items():
+        output = run_checkers.normalize_paths(output, checked_path)
+        for path in sorted({os.path.realpath(workdir), os.path.abspath(workdir)}, key=len, reverse=True):
+            output = output.replace(path, saved_dir)
+        relocated[tool] = output
+    return relocated
+
+
+def save_kept(
+    kept: List[Dict[str, Any]], responses: List[str], model_name: str,
+    dedup_threshold: float = dedup.DEFAULT_THRESHOLD,
+) -> str:
+    """Saves kept examples like agent.py does and writes their results.json alongside."""
+    examples = [
+        {key: ex[key] for key in ("id", "metadata", "code", "full_content", "round")}
+        for ex in kept
+    ]
+    run_dir = generate_json.save_output(examples, "\n\n".join(responses), model_name, dedup_threshold)
+
+    results = []
+    for ex in kept:
+        filename = f"{ex['id']}.py"
+        filepath = os.path.join(run_dir, "source_files", filename)
+        # The workdir is deleted by now; outputs must not point into it
+        outputs = relocate_outputs(ex["outputs"], ex["filepath"], filepath)
+        results.append({"filename": filename, "filepath": filepath, "outputs": outputs, "timings": ex["timings"]})
+    results_path = run_checkers.write_results(run_dir, results)
+    print(f"[INFO] Saved checker results to: {results_path}")
+    return run_dir
+
+
+if __name__ == "__main__":
+    agent = GetAccessToGemini(
+        model="gemini-2.5-flash",
+        token=os.environ.get("GEMINI_API_KEY", ""),
+        api_base=HttpUrl("https://generativelanguage.googleapis.com/v1beta"),
+        timeout=320.0,
+    )
+
+    parser = agent.cli_parser()
+    parser.description = "Generate examples in rounds, keeping only confirmed checker disagreements"
+    parser.add_argument("--target", type=int, default=10, help="Stop after this many disagreements (default: 10)")
+    parser.add_argument("--max-rounds", type=int, default=5, help="Maximum generation rounds (default: 5)")
+    parser.add_argument("--time-budget", type=float, default=1800.0, help="Wall-clock budget in seconds (default: 1800)")
+    parser.add_argument("--token-budget", type=int, default=1_000_000, help="Total LLM token budget (default: 1000000)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Files checked in parallel")
+    parser.add_argument("--skip-duplicates", action="store_true", help="Do not check examples dedup.py flags as near-duplicates of earlier ones")
+    args = parser.parse_args()
+    # Shared with agent.py, but each round here is a single non-streamed request
+    for flag, used in (("--models", args.models), ("--vary-prompts", args.vary_prompts), ("--stream", args.stream)):
+        if used:
+            parser.error(f"{flag} is not supported by generation_loop.py")
+
+    if args.list_models:
+        agent.print_models()
+        exit(0)
+
+    agent.apply_args(args)
+    if not agent.has_credentials:
+        raise ValueError("Please set GEMINI_API_KEY, or GEMINI_API_KEYS / --api-keys-file for a key pool")
+
+    print(f"Using model: {agent.model}")
+    start = time.monotonic()
+    kept, responses, rounds = run_loop(
+        agent, args.target, args.max_rounds, args.time_budget, args.token_budget, args.workers,
+        structured=not args.free_text, dedup_threshold=args.dedup_threshold, skip_duplicates=args.skip_duplicates,
+    )
+    elapsed = time.monotonic() - start
+
+    if kept:
+        save_kept(kept, responses, agent.model, args.dedup_threshold)
+    else:
+        print("[WARNING] No disagreements found to save.")
+
+    tokens = agent.metrics.summary()["total_tokens"]
+    print(f"\n[INFO] {len(kept)} confirmed disagreements in {rounds} rounds, {elapsed:.1f}s, {tokens} tokens")
+    print(f"[INFO] Disagreements per minute: {len(kept) / (elapsed / 60) if elapsed else 0.0:.2f}")
+    print(f"[INFO] Disagreements per 1k tokens: {len(kept) / (tokens / 1000) if tokens else 0.0:.3f}")
+    agent.metrics.print_summary()
+    if agent.key_pool is not None:
+        agent.key_pool.print_usage()
@@ -0,0 +1,114 @@
+"""
+Pool of Gemini API keys with quota-aware load balancing.
+
+Keys come from GEMINI_API_KEYS (comma or whitespace separated) or from a file with
+one key per line (GEMINI_API_KEY_FILE / --api-keys-file). Each request goes to the
+key with the most remaining quota in the current one-minute window; a key that
+answers 429 is taken out of rotation until its Retry-After (or the cooldown) passes.
+"""
+import os
+import re
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Deque
+
+WINDOW = 60.0
+
+
+def load_keys(path: Optional[str] = None) -> List[str]:
+    """Keys from `path` (one per line, '#' comments allowed) or else GEMINI_API_KEYS."""
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [line.split("#", 1)[0].strip() for line in f]
+        keys = [line for line in lines if line]
+    else:
+        keys = [k for k in re.split(r"[,\s]+", os.environ.get("GEMINI_API_KEYS", "")) if k]
+    return list(dict.fromkeys(keys))
+
+
+def mask(key: str) -> str:
+    """Printable label for a key."""
+    return f"...{key[-4:]}" if len(key) > 4 else "..."
+
+
+class KeyPool:
+    """Thread-safe key rotation by remaining per-minute quota, with 429 cooldowns."""
+
+    def __init__(self, keys: List[str], requests_per_minute: int = 60, cooldown: float = 60.0):
+        if not keys:
+            raise ValueError("KeyPool needs at least one API key")
+        self.keys = list(keys)
+        self.requests_per_minute = requests_per_minute
+        self.cooldown = cooldown
+        self._cond = threading.Condition()
+        self._recent: Dict[str, Deque[float]] = {k: deque() for k in self.keys}
+        self._cooling_until: Dict[str, float] = {k: 0.0 for k in self.keys}
+        self._stats: Dict[str, Dict[str, int]] = {
+            k: {"requests": 0, "errors": 0, "rate_limited": 0} for k in self.keys
+        }
+
+    def _remaining(self, key: str, now: float) -> int:
+        recent = self._recent[key]
+        while recent and now - recent[0] >= WINDOW:
+            recent.popleft()
+        return self.requests_per_minute - len(recent)
+
+    def acquire(self) -> str:
+        """Returns the key with the most remaining quota, waiting if every key is exhausted or cooling down."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                available = [
+                    k for k in self.keys
+                    if self._cooling_until[k] <= now and self._remaining(k, now) > 0
+                ]
+                if available:
+                    key = max(available, key=lambda k: (self._remaining(k, now), -self._stats[k]["requests"]))
+                    self._recent[key].append(now)
+                    self._stats[key]["requests"] += 1
+                    return key
+
+                wake_times = []
+                for k in self.keys:
+                    wake = self._cooling_until[k]
+                    if self._remaining(k, now) <= 0:
+                        wake = max(wake, self._recent[k][0] + WINDOW)
+                    wake_times.append(wake)
+                self._cond.wait(timeout=max(0.01, min(wake_times) - now))
+
+    def report(self, key: str, status: Optional[int], retry_after: Optional[float] = None) -> None:
+        """Records the outcome of a request made with `key` (status None means a network error)."""
+        with self._cond:
+            if status is not None and status < 400:
+                return
+            self._stats[key]["errors"] += 1
+            if status == 429:
+                self._stats[key]["rate_limited"] += 1
+                self._cooling_until[key] = time.monotonic() + (retry_after if retry_after is not None else self.cooldown)
+                self._cond.notify_all()
+
+    def usage(self) -> List[Dict[str, Any]]:
+        """Per-key request counts and current state."""
+        with self._cond:
+            now = time.monotonic()
+            return [
+                {
+                    "key": mask(k),
+                    **self._stats[k],
+                    "remaining": self._remaining(k, now),
+                    "cooling": max(0.0, self._cooling_until[k] - now),
+                }
+                for k in self.keys
+            ]
+
+    def print_usage(self) -> None:
+        print("\n" + "=" * 40)
+        print("API KEY USAGE")
+        print("=" * 40)
+        print(f"{'Key':<10} | {'Requests':<8} | {'Errors':<6} | {'429s':<5} | {'State'}")
+        print("-" * 40)
+        for row in self.usage():
+            state = f"cooling {row['cooling']:.1f}s" if row["cooling"] else f"{row['remaining']} left/min"
+            print(f"{row['key']:<10} | {row['requests']:<8} | {row['errors']:<6} | {row['rate_limited']:<5} | {state}")
+        print("=" * 40)
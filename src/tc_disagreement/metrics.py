@@ -0,0 +1,108 @@
+"""
+Token usage and latency instrumentation for LLM calls.
+
+Every GetAccessToGemini call produces a `CallMetrics` record. Records are kept in
+memory for the per-run summary and, when a path is given, appended to a JSONL log.
+"""
+import os
+import math
+import time
+import threading
+from typing import Dict, Any, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class CallMetrics(BaseModel):
+    """Measurements for a single LLM call."""
+    model: str
+    timestamp: float = Field(default_factory=time.time, description="Unix time the call started")
+    prompt_tokens: int = 0
+    candidate_tokens: int = 0
+    total_tokens: int = 0
+    ttfb: Optional[float] = Field(None, description="Seconds until response headers arrived")
+    latency: float = Field(0.0, description="Seconds from call start to parsed reply")
+    retries: int = 0
+    hedged: bool = Field(False, description="A duplicate request was sent to cut tail latency")
+    cache: str = Field("off", description="Cache status, e.g. off, record, replay")
+    status: str = "ok"
+    error: Optional[str] = None
+
+    def record_usage(self, data: Dict[str, Any]) -> None:
+        """Copies Gemini's `usageMetadata` token counts into this record."""
+        usage = data.get("usageMetadata") or {}
+        self.prompt_tokens = int(usage.get("promptTokenCount", 0))
+        self.candidate_tokens = int(usage.get("candidatesTokenCount", 0))
+        self.total_tokens = int(usage.get("totalTokenCount", self.prompt_tokens + self.candidate_tokens))
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of `values` (q in [0, 1])."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+class MetricsLog:
+    """Thread-safe collection of CallMetrics with optional JSONL persistence."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.calls: List[CallMetrics] = []
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def record(self, call: CallMetrics) -> None:
+        with self._lock:
+            self.calls.append(call)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(call.model_dump_json() + "\n")
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregates over every call recorded so far."""
+        with self._lock:
+            calls = list(self.calls)
+
+        latencies = [c.latency for c in calls]
+        ttfbs = [c.ttfb for c in calls if c.ttfb is not None]
+        cache: Dict[str, int] = {}
+        for c in calls:
+            cache[c.cache] = cache.get(c.cache, 0) + 1
+
+        return {
+            "calls": len(calls),
+            "errors": sum(1 for c in calls if c.status != "ok"),
+            "retries": sum(c.retries for c in calls),
+            "hedged": sum(1 for c in calls if c.hedged),
+            "prompt_tokens": sum(c.prompt_tokens for c in calls),
+            "candidate_tokens": sum(c.candidate_tokens for c in calls),
+            "total_tokens": sum(c.total_tokens for c in calls),
+            "latency_mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p90": percentile(latencies, 0.9),
+            "latency_max": max(latencies, default=0.0),
+            "ttfb_mean": sum(ttfbs) / len(ttfbs) if ttfbs else 0.0,
+            "cache": cache,
+        }
+
+    def print_summary(self, title: str = "LLM CALL METRICS") -> None:
+        s = self.summary()
+        print("\n" + "=" * 40)
+        print(title)
+        print("=" * 40)
+        print(f"{'Calls':<18} | {s['calls']} ({s['errors']} failed, {s['retries']} retries, {s['hedged']} hedged)")
+        print(f"{'Prompt tokens':<18} | {s['prompt_tokens']}")
+        print(f"{'Candidate tokens':<18} | {s['candidate_tokens']}")
+        print(f"{'Total tokens':<18} | {s['total_tokens']}")
+        print(f"{'Latency mean':<18} | {s['latency_mean']:.2f}s")
+        print(f"{'Latency p50/p90':<18} | {s['latency_p50']:.2f}s / {s['latency_p90']:.2f}s")
+        print(f"{'Latency max':<18} | {s['latency_max']:.2f}s")
+        print(f"{'TTFB mean':<18} | {s['ttfb_mean']:.2f}s")
+        print(f"{'Cache':<18} | " + ", ".join(f"{k}={v}" for k, v in sorted(s["cache"].items())))
+        if self.path:
+            print(f"{'Log':<18} | {self.path}")
+        print("=" * 40)
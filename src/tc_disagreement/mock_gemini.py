@@ -0,0 +1,363 @@
+"""
+Local stand-in for the Google Gemini REST API.
+
+Implements `models/{model}:generateContent` and `models/{model}:streamGenerateContent`
+so the pipeline can be benchmarked and load-tested without a GEMINI_API_KEY or network.
+Generation prompts are answered by replaying the recorded `raw_response` values from
+`generated_examples/*/examples.json`; judge prompts get a templated verdict.
+
+Usage:
+    python mock_gemini.py --port 8765 --latency 0.5 --error-rate 0.05 --rate-limit-rate 0.1
+    GEMINI_API_KEY=dummy python agent.py --api-base http://127.0.0.1:8765/v1beta
+    GEMINI_API_KEY=dummy GEMINI_API_BASE=http://127.0.0.1:8765/v1beta python eval.py
+"""
+import os
+import re
+import json
+import glob
+import time
+import random
+import sys
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit, parse_qs
+
+from pydantic import BaseModel, Field
+
+import generate_json
+from blob_store import load_examples
+
+BASE_GEN_DIR = "generated_examples"
+
+ROUTE_PATTERN = re.compile(r"/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)$")
+
+FALLBACK_GENERATION = """# id: protocol-default-args-mock
+# EXPECTED:
+#   mypy: Error
+#   pyright: No error
+#   pyre: Error
+#   zuban: Error
+# REASON: Templated response served by the local mock server.
+from typing import Protocol
+
+class Reader(Protocol):
+    def read(self, size: int = -1) -> bytes: ...
+
+class FileReader:
+    def read(self, size: int = 1024) -> bytes:
+        return b"data"
+
+def use_reader(r: Reader) -> None: ...
+
+if __name__ == "__main__":
+    use_reader(FileReader())
+"""
+
+JUDGE_TEMPLATE = "VERDICT: {verdict}\nREASON: Templated verdict from the local mock server."
+OUTPUT_ID_PATTERN = re.compile(r"^Output ID: (\S+)$", re.MULTILINE)
+
+
+class MockConfig(BaseModel):
+    """Behaviour knobs for the mock server."""
+    latency: float = Field(0.0, ge=0, description="Base response latency (seconds)")
+    jitter: float = Field(0.0, ge=0, description="Uniform random latency added on top (seconds)")
+    error_rate: float = Field(0.0, ge=0, le=1, description="Probability of answering 503")
+    rate_limit_rate: float = Field(0.0, ge=0, le=1, description="Probability of answering 429")
+    retry_after: int = Field(1, ge=0, description="Retry-After header sent with 429 responses")
+    stream_chunks: int = Field(8, gt=0, description="Number of chunks a streamed reply is split into")
+    seed: Optional[int] = Field(None, description="Seed for reproducible latency and error injection")
+    responses: List[str] = Field(default_factory=list, description="Recorded generation responses to replay")
+
+
+def load_recorded_responses(base_dir: str = BASE_GEN_DIR) -> List[str]:
+    """Collects every `raw_response` saved by previous generation runs, oldest first."""
+    responses = []
+    for json_path in sorted(glob.glob(os.path.join(base_dir, "*", "examples.json"))):
+        data = load_examples(json_path)
+        if data.get("raw_response"):
+            responses.append(data["raw_response"])
+    return responses
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for usage metadata."""
+    return max(1, len(text) // 4)
+
+
+class MockGemini:
+    """Produces Gemini-shaped replies according to a `MockConfig`."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._next_response = 0
+        self.stats: Dict[str, int] = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0}
+
+    def _roll(self) -> Dict[str, float]:
+        with self._lock:
+            self.stats["requests"] += 1
+            return {
+                "delay": self.config.latency + self._rng.random() * self.config.jitter,
+                "fault": self._rng.random(),
+            }
+
+    def inject_fault(self) -> Optional[int]:
+        """Sleeps for the configured latency and returns an HTTP status to fail with, if any."""
+        roll = self._roll()
+        if roll["delay"]:
+            time.sleep(roll["delay"])
+        with self._lock:
+            if roll["fault"] < self.config.rate_limit_rate:
+                self.stats["rate_limited"] += 1
+                return 429
+            if roll["fault"] < self.config.rate_limit_rate + self.config.error_rate:
+                self.stats["errors"] += 1
+                return 503
+            self.stats["ok"] += 1
+        return None
+
+    def reply_text(self, prompt: str, temperature: float = 0.0) -> str:
+        """
+        Templated verdict for judge prompts, recorded generation output otherwise.
+        Sampled judge replies (temperature > 0) flip the verdict with probability temperature / 4.
+        """
+        if "VERDICT:" in prompt:
+            digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+            correct = bool(digest[0] % 4)
+            if temperature > 0:
+                with self._lock:
+                    correct ^= self._rng.random() < temperature / 4
+            return JUDGE_TEMPLATE.format(verdict="CORRECT" if correct else "INCORRECT")
+
+        if not self.config.responses:
+            return FALLBACK_GENERATION
+        with self._lock:
+            text = self.config.responses[self._next_response % len(self.config.responses)]
+            self._next_response += 1
+        return text
+
+    @staticmethod
+    def batch_judge_reply_text(prompt: str) -> str:
+        """JSON verdict array for every 'Output ID:' in a batched judge prompt."""
+        items = []
+        for output_id in OUTPUT_ID_PATTERN.findall(prompt):
+            digest = hashlib.sha256(f"{output_id}\n{prompt}".encode("utf-8")).digest()
+            items.append({
+                "id": output_id,
+                "verdict": "CORRECT" if digest[0] % 4 else "INCORRECT",
+                "reason": "Templated verdict from the local mock server.",
+            })
+        return json.dumps(items)
+
+    def structured_reply_text(self, prompt: str) -> str:
+        """Recorded generation output re-encoded as the JSON array EXAMPLES_SCHEMA describes."""
+        items = []
+        for example in generate_json.parse_generated_content(self.reply_text(prompt)):
+            meta = generate_json.split_metadata(example["metadata"])
+            items.append({"id": example["id"], **meta, "code": example["code"]})
+        return json.dumps(items)
+
+    @staticmethod
+    def build_response(text: str, prompt: str, model: str) -> Dict[str, Any]:
+        prompt_tokens = estimate_tokens(prompt)
+        candidate_tokens = estimate_tokens(text)
+        return {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": candidate_tokens,
+                "totalTokenCount": prompt_tokens + candidate_tokens,
+            },
+            "modelVersion": model,
+        }
+
+    def split_chunks(self, text: str) -> List[str]:
+        size = max(1, -(-len(text) // self.config.stream_chunks))
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def extract_prompt(payload: Dict[str, Any]) -> str:
+    """Concatenates every text part of a generateContent request body."""
+    texts = []
+    for content in payload.get("contents", []):
+        for part in content.get("parts", []):
+            if "text" in part:
+                texts.append(part["text"])
+    return "\n".join(texts)
+
+
+class MockGeminiHandler(BaseHTTPRequestHandler):
+    server: "MockGeminiServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error_status(self, status: int) -> None:
+        messages = {
+            404: ("NOT_FOUND", "Unknown route."),
+            400: ("INVALID_ARGUMENT", "Invalid JSON payload received."),
+            429: ("RESOURCE_EXHAUSTED", "Resource has been exhausted (e.g. check quota)."),
+            503: ("UNAVAILABLE", "The model is overloaded. Please try again later."),
+        }
+        reason, message = messages[status]
+        headers = {"Retry-After": str(self.server.mock.config.retry_after)} if status == 429 else None
+        self._send_json(status, {"error": {"code": status, "message": message, "status": reason}}, headers)
+
+    def do_POST(self) -> None:
+        parts = urlsplit(self.path)
+        route = ROUTE_PATTERN.search(parts.path)
+        if not route:
+            self._send_error_status(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_error_status(400)
+            return
+
+        mock = self.server.mock
+        status = mock.inject_fault()
+        if status is not None:
+            self._send_error_status(status)
+            return
+
+        model = route.group("model")
+        prompt = extract_prompt(payload)
+        structured = payload.get("generationConfig", {}).get("responseMimeType") == "application/json"
+        if structured and OUTPUT_ID_PATTERN.search(prompt):
+            text = mock.batch_judge_reply_text(prompt)
+        elif structured and "VERDICT:" not in prompt:
+            text = mock.structured_reply_text(prompt)
+        else:
+            text = mock.reply_text(prompt, payload.get("generationConfig", {}).get("temperature", 0.0))
+
+        if route.group("method") == "generateContent":
+            self._send_json(200, mock.build_response(text, prompt, model))
+            return
+
+        sse = parse_qs(parts.query).get("alt") == ["sse"]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream" if sse else "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        chunks = mock.split_chunks(text)
+        for i, chunk in enumerate(chunks):
+            body = json.dumps(mock.build_response(chunk, prompt, model))
+            if sse:
+                frame = f"data: {body}\r\n\r\n"
+            else:
+                frame = ("[" if i == 0 else ",\r\n") + body + ("]" if i == len(chunks) - 1 else "")
+            data = frame.encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class MockGeminiServer(ThreadingHTTPServer):
+    """Threaded HTTP server that can also run in the background of a benchmark script."""
+    daemon_threads = True
+
+    def __init__(self, config: MockConfig, host: str = "127.0.0.1", port: int = 8765, verbose: bool = False):
+        super().__init__((host, port), MockGeminiHandler)
+        self.mock = MockGemini(config)
+        self.verbose = verbose
+        self._thread: Optional[threading.Thread] = None
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Hedged or cancelled requests hang up mid-response; that is expected, not an error
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def api_base(self) -> str:
+        """Value to pass as `api_base` to GetAccessToGemini."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1beta"
+
+    def start(self) -> "MockGeminiServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+
+def cli_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run a local mock of the Google Gemini API")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Base latency per request in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra uniform random latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429 responses")
+    parser.add_argument("--stream-chunks", type=int, default=8, help="Chunks per streamed reply")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible runs")
+    parser.add_argument(
+        "--responses-dir",
+        default=BASE_GEN_DIR,
+        help=f"Directory whose */examples.json raw responses are replayed (default: {BASE_GEN_DIR})"
+    )
+    parser.add_argument("--response-file", help="Serve the contents of this file for every generation prompt")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    return parser
+
+
+if __name__ == "__main__":
+    args = cli_parser().parse_args()
+
+    if args.response_file:
+        with open(args.response_file, "r", encoding="utf-8") as f:
+            responses = [f.read()]
+    else:
+        responses = load_recorded_responses(args.responses_dir)
+
+    config = MockConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        stream_chunks=args.stream_chunks,
+        seed=args.seed,
+        responses=responses,
+    )
+    server = MockGeminiServer(config, host=args.host, port=args.port, verbose=args.verbose)
+
+    print(f"[INFO] Mock Gemini listening on {server.api_base}")
+    print(f"[INFO] Replaying {len(responses)} recorded generation responses.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n[INFO] Served: {server.mock.stats}")
@@ -0,0 +1,119 @@
+"""
+Retry and circuit-breaker policy for Gemini requests.
+
+Errors are classified by HTTP status: 408, 429 and 5xx (plus network failures) are
+retried with jittered exponential backoff, everything else fails immediately. A
+shared retry budget caps retries to a fraction of all requests so a flaky upstream
+cannot multiply the run time, and a circuit breaker fails fast after repeated
+upstream failures until a cooldown has passed.
+"""
+import time
+import random
+import threading
+from typing import Optional
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class GeminiAPIError(ValueError):
+    """A failed Gemini request; `status_code` is None for network errors."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        """Network errors and transient statuses are worth retrying; other 4xx never are."""
+        return self.status_code is None or self.status_code in RETRYABLE_STATUS
+
+
+class CircuitOpenError(GeminiAPIError):
+    """Raised without contacting the API while the circuit breaker is open."""
+
+    @property
+    def retryable(self) -> bool:
+        return False
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (0-based), at least Retry-After."""
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    return max(delay, retry_after or 0.0)
+
+
+class RetryBudget:
+    """Allows at most `min_retries + ratio * requests` retries over the lifetime of the budget."""
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def try_spend(self) -> bool:
+        """Takes one retry from the budget; False once the budget is exhausted."""
+        with self._lock:
+            if self.retries >= self.min_retries + self.ratio * self.requests:
+                return False
+            self.retries += 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive upstream failures; open -> half-open
+    after `reset_timeout` seconds, when a single probe request decides whether to close again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_request(self) -> None:
+        """Raises CircuitOpenError instead of letting a request through while the breaker is open."""
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == "closed":
+                return
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return
+            remaining = max(0.0, self.reset_timeout - (now - self._opened_at))
+            raise CircuitOpenError(f"Circuit breaker open after repeated Gemini failures; retry in {remaining:.1f}s")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
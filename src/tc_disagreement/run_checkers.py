@@ -3,7 +3,16 @@ import json
 import subprocess
 import sys
 import glob
-from typing import Dict, List, Any
+import time
+import argparse
+import functools
+from typing import Dict, List, Any, Optional, Tuple
+
+import corpus_db
+from archive import ResultArchive, archive_results
+
+from dedup import duplicate_ids
+from validate import invalid_ids
 
 CHECKERS = {
     "mypy": ["mypy"],
@@ -12,6 +21,14 @@ CHECKERS = {
     "ty": ["ty", "check"]
 }
 
+# Substring each checker prints when it finds nothing to report
+CLEAN_MARKERS = {
+    "mypy": "Success: no issues found",
+    "pyrefly": "INFO 0 errors",
+    "zuban": "Success: no issues found",
+    "ty": "All checks passed!"
+}
+
 BASE_GEN_DIR = "generated_examples"
 
 def get_latest_generation_dir() -> str:
@@ -21,7 +38,7 @@ def get_latest_generation_dir() -> str:
         sys.exit(1)
         
     subdirs = [os.path.join(BASE_GEN_DIR, d) for d in os.listdir(BASE_GEN_DIR) 
-               if os.path.isdir(os.path.join(BASE_GEN_DIR, d))]
+               if os.path.exists(os.path.join(BASE_GEN_DIR, d, "examples.json"))]
     
     if not subdirs:
         print(f"[ERROR] No generated examples found in '{BASE_GEN_DIR}'.")
@@ -30,6 +47,14 @@ def get_latest_generation_dir() -> str:
     latest = max(subdirs, key=os.path.basename)
     return latest
 
+def normalize_paths(output: str, filepath: str) -> str:
+    """Replaces the checked file's path with its bare filename, however the checker spelled it."""
+    filename = os.path.basename(filepath)
+    spellings = {os.path.realpath(filepath), os.path.abspath(filepath), filepath, os.path.relpath(filepath)}
+    for path in sorted(spellings, key=len, reverse=True):
+        output = output.replace(path, filename)
+    return output
+
 def run_tool(command: List[str], filepath: str) -> str:
     """Runs a single type checker command on a file."""
     try:
@@ -45,6 +70,7 @@ def run_tool(command: List[str], filepath: str) -> str:
         output = result.stdout
         if result.stderr:
             output += "\n[STDERR]\n" + result.stderr
+        output = normalize_paths(output, filepath)
             
         return output.strip() if output.strip() else "Success (No Output)"
         
@@ -53,8 +79,81 @@ def run_tool(command: List[str], filepath: str) -> str:
     except Exception as e:
         return f"Execution Error: {str(e)}"
 
+@functools.lru_cache(maxsize=None)
+def checker_version(tool_name: str) -> str:
+    """First line of `<checker> --version`, or 'unknown' if it cannot be run."""
+    try:
+        result = subprocess.run(
+            [CHECKERS[tool_name][0], "--version"],
+            capture_output=True,
+            text=True,
+            check=False
+        )
+    except (FileNotFoundError, OSError):
+        return "unknown"
+    lines = (result.stdout or result.stderr).strip().splitlines()
+    return lines[0].strip() if lines else "unknown"
+
+def checker_versions() -> Dict[str, str]:
+    return {tool_name: checker_version(tool_name) for tool_name in CHECKERS}
+
+def check_file_timed(filepath: str) -> Tuple[Dict[str, str], Dict[str, float]]:
+    """Runs every configured checker on one file; returns outputs and wall-clock seconds per checker."""
+    outputs, timings = {}, {}
+    for tool_name, command in CHECKERS.items():
+        start = time.perf_counter()
+        outputs[tool_name] = run_tool(command, filepath)
+        timings[tool_name] = round(time.perf_counter() - start, 3)
+    return outputs, timings
+
+def check_file(filepath: str) -> Dict[str, str]:
+    """Runs every configured checker on one file."""
+    return check_file_timed(filepath)[0]
+
+def reports_error(tool_name: str, output: str) -> Optional[bool]:
+    """
+    Classifies a checker output: True if it flagged the file, False if it passed,
+    None if the checker could not be run at all.
+    """
+    if output.startswith("Error: Command") or output.startswith("Execution Error"):
+        return None
+    marker = CLEAN_MARKERS.get(tool_name)
+    if marker is not None:
+        return marker not in output
+    return output != "Success (No Output)"
+
+def checkers_disagree(outputs: Dict[str, str]) -> bool:
+    """True when the checkers that ran do not all reach the same error/no-error outcome."""
+    statuses = {reports_error(tool, out) for tool, out in outputs.items()}
+    statuses.discard(None)
+    return len(statuses) > 1
+
+def write_results(target_dir: str, all_results: List[Dict[str, Any]]) -> str:
+    """Writes results.json for a generation folder (and the corpus database) and returns its path."""
+    results_json_path = os.path.join(target_dir, "results.json")
+    
+    final_output = {
+        "timestamp": os.path.basename(target_dir),
+        "checkers_used": list(CHECKERS.keys()),
+        "checker_versions": checker_versions(),
+        "results": all_results
+    }
+    
+    with open(results_json_path, "w", encoding="utf-8") as f:
+        json.dump(final_output, f, indent=4)
+
+    with corpus_db.CorpusStore() as store:
+        store.add_checker_results(os.path.basename(target_dir), all_results, final_output["checker_versions"])
+    return results_json_path
+
 def main():
     """Finding Python files and run the checkers."""
+    parser = argparse.ArgumentParser(description="Run every type checker on the latest generated examples")
+    parser.add_argument("--include-invalid", action="store_true", help="Also check examples marked invalid by validate.py")
+    parser.add_argument("--skip-duplicates", action="store_true", help="Leave out examples marked as near-duplicates by dedup.py (default: check them too)")
+    parser.add_argument("--archive", default=None, help="Also append the results to this compressed archive")
+    args = parser.parse_args()
+
     target_dir = get_latest_generation_dir()
     source_files_dir = os.path.join(target_dir, "source_files")
     
@@ -67,6 +166,18 @@ def main():
         print("[ERROR] No .py files found to check.")
         sys.exit(1)
 
+    if not args.include_invalid:
+        skipped = {f"{file_id}.py" for file_id in invalid_ids(target_dir)}
+        if skipped:
+            print(f"[INFO] Skipping {len(skipped)} examples marked invalid: {', '.join(sorted(skipped))}")
+            py_files = [path for path in py_files if os.path.basename(path) not in skipped]
+
+    if args.skip_duplicates:
+        skipped = {f"{file_id}.py" for file_id in duplicate_ids(target_dir)}
+        if skipped:
+            print(f"[INFO] Skipping {len(skipped)} near-duplicate examples: {', '.join(sorted(skipped))}")
+            py_files = [path for path in py_files if os.path.basename(path) not in skipped]
+
     print(f"--- Running Type Checkers on {len(py_files)} files ---")
     print(f"Directory: {target_dir}\n")
 
@@ -76,30 +187,21 @@ def main():
         filename = os.path.basename(filepath)
         print(f"Checking {filename}...")
         
+        outputs, timings = check_file_timed(filepath)
         file_result = {
             "filename": filename,
             "filepath": filepath,
-            "outputs": {}
+            "outputs": outputs,
+            "timings": timings
         }
-        
-        for tool_name, command in CHECKERS.items():
-            # print(f"  > {tool_name}...", end=" ", flush=True)
-            output = run_tool(command, filepath)
-            file_result["outputs"][tool_name] = output
-            # print("Done.")
             
         all_results.append(file_result)
 
-    results_json_path = os.path.join(target_dir, "results.json")
-    
-    final_output = {
-        "timestamp": os.path.basename(target_dir),
-        "checkers_used": list(CHECKERS.keys()),
-        "results": all_results
-    }
-    
-    with open(results_json_path, "w", encoding="utf-8") as f:
-        json.dump(final_output, f, indent=4)
+    results_json_path = write_results(target_dir, all_results)
+    if args.archive:
+        with ResultArchive(args.archive) as archive:
+            archive_results(archive, os.path.basename(target_dir), all_results, checker_versions())
+        print(f"[INFO] Archived {len(all_results)} results to: {args.archive}")
 
     print(f"\n[SUCCESS] Results saved to: {results_json_path}")
 
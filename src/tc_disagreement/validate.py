@@ -0,0 +1,141 @@
+"""
+Cheap validation of generated examples before any type checker runs.
+
+Every example is compiled (which also parses it) in a process pool; optionally the
+module is also imported in an isolated subprocess, without running its `__main__`
+block, to catch errors at definition time. Invalid examples are marked in
+examples.json (`valid`, `validation_error`) and run_checkers.py skips them.
+
+Usage:
+    python validate.py                      # latest generation folder
+    python validate.py generated_examples/2026-01-08_16-42-53 --import-check
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+
+from blob_store import load_examples
+
+BASE_GEN_DIR = "generated_examples"
+
+# Runs a file as a plain import (so `if __name__ == "__main__":` is skipped).
+# reveal_type is provided because generated snippets use it for the checkers.
+IMPORT_RUNNER = (
+    "import builtins, runpy, sys, typing; "
+    "builtins.reveal_type = getattr(typing, 'reveal_type', lambda obj: obj); "
+    "runpy.run_path(sys.argv[1], run_name='__tc_validate__')"
+)
+
+
+def check_syntax(code: str, filename: str = "<example>") -> Optional[str]:
+    """Returns None if `code` compiles, otherwise a one-line error."""
+    try:
+        compile(code, filename, "exec", dont_inherit=True)
+    except SyntaxError as e:
+        return f"{type(e).__name__}: {e.msg} (line {e.lineno})"
+    except ValueError as e:
+        return f"ValueError: {e}"
+    return None
+
+
+def check_import(code: str, timeout: float = 10.0) -> Optional[str]:
+    """
+    Imports `code` in a separate isolated interpreter inside a throwaway directory.
+    Returns None on success, otherwise the last line of the traceback.
+    """
+    with tempfile.TemporaryDirectory(prefix="tc_validate_") as workdir:
+        path = os.path.join(workdir, "example.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(code)
+        try:
+            result = subprocess.run(
+                [sys.executable, "-I", "-c", IMPORT_RUNNER, path],
+                cwd=workdir,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                env={"PATH": os.environ.get("PATH", "")},
+            )
+        except subprocess.TimeoutExpired:
+            return f"Import timed out after {timeout:.0f}s"
+    if result.returncode == 0:
+        return None
+    lines = [line for line in result.stderr.strip().splitlines() if line.strip()]
+    return lines[-1] if lines else f"Import failed with exit code {result.returncode}"
+
+
+def validate_examples(
+    examples: List[Dict[str, Any]],
+    import_check: bool = False,
+    workers: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Returns copies of `examples` with `valid` and `validation_error` set."""
+    codes = [ex["full_content"] for ex in examples]
+    names = [f"{ex['id']}.py" for ex in examples]
+
+    if len(examples) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            errors = list(pool.map(check_syntax, codes, names))
+    else:
+        errors = [check_syntax(code, name) for code, name in zip(codes, names)]
+
+    if import_check:
+        pending = [i for i, error in enumerate(errors) if error is None]
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as pool:
+            for i, error in zip(pending, pool.map(check_import, [codes[i] for i in pending])):
+                errors[i] = error
+
+    return [
+        {**ex, "valid": error is None, "validation_error": error}
+        for ex, error in zip(examples, errors)
+    ]
+
+
+def invalid_ids(run_dir: str) -> List[str]:
+    """Ids marked invalid in `<run_dir>/examples.json` (none if it was never validated)."""
+    json_path = os.path.join(run_dir, "examples.json")
+    if not os.path.exists(json_path):
+        return []
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [ex["id"] for ex in data.get("examples", []) if ex.get("valid") is False]
+
+
+def print_report(examples: List[Dict[str, Any]]) -> None:
+    invalid = [ex for ex in examples if not ex["valid"]]
+    print(f"[INFO] Validated {len(examples)} examples: {len(examples) - len(invalid)} valid, {len(invalid)} invalid.")
+    for ex in invalid:
+        print(f"  x {ex['id']}: {ex['validation_error']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate generated examples and mark invalid ones")
+    parser.add_argument("run_dir", nargs="?", help="Generation folder (default: the latest one)")
+    parser.add_argument("--import-check", action="store_true", help="Also import each example in an isolated subprocess")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if args.run_dir:
+        run_dir = args.run_dir
+    else:
+        from run_checkers import get_latest_generation_dir
+        run_dir = get_latest_generation_dir()
+
+    json_path = os.path.join(run_dir, "examples.json")
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    validated = validate_examples(load_examples(json_path)["examples"], args.import_check, args.workers)
+    print_report(validated)
+    # Only the flags are written back, so blob references stay as they are
+    for ex, result in zip(data.get("examples", []), validated):
+        ex["valid"], ex["validation_error"] = result["valid"], result["validation_error"]
+
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+    print(f"[INFO] Updated {json_path}")
@@ -0,0 +1,44 @@
+"""
+Cache keys for judge verdicts.
+
+A verdict depends on the source, on what the checker reported, on the judge model
+and on the judge prompt, not on which checker produced the output. Outputs are
+normalized before hashing (file paths, summary lines, [STDERR] markers, whitespace
+and every "no errors" spelling collapse), so identical findings from mypy and zuban,
+or a rerun of the same file, map to the same key. Verdicts are stored in the
+corpus database (see corpus_db.CorpusStore.get_cached_verdict).
+"""
+import re
+import json
+import hashlib
+
+CLEAN_OUTPUT = "<no errors reported>"
+
+# Lines that only summarize the diagnostics above them
+SUMMARY_LINES = re.compile(
+    r"^\s*(Found \d+ errors? in \d+ files?.*|Found \d+ diagnostics?|INFO \d+ errors?.*|"
+    r"Success: no issues found.*|Success \(No Output\)|All checks passed!|\[STDERR\])\s*$"
+)
+PATH_PREFIX = re.compile(r"(?:[\w.-]*[/\\])+(?=[\w.-]+\.py\b)")
+
+
+def normalize_output(output: str) -> str:
+    """Checker-independent form of an output that keeps every reported diagnostic."""
+    lines = []
+    for line in output.splitlines():
+        if SUMMARY_LINES.match(line):
+            continue
+        line = PATH_PREFIX.sub("", line).rstrip()
+        if line:
+            lines.append(re.sub(r"\s+", " ", line))
+    return "\n".join(lines) or CLEAN_OUTPUT
+
+
+def cache_key(source_code: str, output: str, judge_model: str, prompt_version: str) -> str:
+    parts = [
+        hashlib.sha256(source_code.encode("utf-8")).hexdigest(),
+        hashlib.sha256(normalize_output(output).encode("utf-8")).hexdigest(),
+        judge_model,
+        prompt_version,
+    ]
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()